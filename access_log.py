@@ -0,0 +1,196 @@
+"""
+📒 Asynchronous Access Log
+==========================
+Request threads hand search records to a bounded in-memory queue and return
+immediately; a background thread drains it and writes batches with one
+``executemany`` per transaction.
+
+When the queue is full (the DB is slow or locked), new records are appended to
+a per-process spill file if one is configured, and replayed once the writer
+catches up (files left by exited workers are adopted by a live one);
+without a spill file they are dropped and counted. Logging never blocks a
+request on SQLite.
+"""
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # exists but owned by someone else
+    return True
+
+
+class AccessLogWriter:
+    """``record(...)`` enqueues; ``write_batch(rows)`` persists a list of row tuples."""
+
+    def __init__(self, write_batch: Callable[[List[Sequence]], None], max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval_ms: float = 1000.0, spill_path: Optional[str] = None):
+        self.write_batch = write_batch
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval_ms = float(flush_interval_ms)
+        self.spill_path = spill_path or None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.write_errors = 0
+        self.last_batch_ms = None
+
+    def record(self, trial_key: str, query: str, ip_address: Optional[str], latency_ms: Optional[int],
+               sources: Sequence[str] = (), cache_hit: bool = False, timestamp: Optional[str] = None) -> None:
+        row = (trial_key, query, timestamp or time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), ip_address,
+               latency_ms, ",".join(sources), int(bool(cache_hit)))
+        try:
+            self._queue.put_nowait(row)
+            self.enqueued += 1
+        except queue.Full:
+            self._spill([row])
+
+    def _own_spill_path(self) -> str:
+        # One file per worker process: the lock only serializes this process's
+        # threads, so workers must never append to a file another one replays
+        return f"{self.spill_path}.{os.getpid()}"
+
+    def _spill(self, rows: List[Sequence]) -> None:
+        if not self.spill_path:
+            self.dropped += len(rows)
+            return
+        try:
+            with self._spill_lock, open(self._own_spill_path(), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            self.spilled += len(rows)
+        except OSError as e:
+            print(f"[ACCESS-LOG] Spill to {self._own_spill_path()} failed: {e}")
+            self.dropped += len(rows)
+
+    def _write(self, rows: List[Sequence]) -> bool:
+        started = time.perf_counter()
+        try:
+            self.write_batch(rows)
+        except Exception as e:
+            print(f"[ACCESS-LOG] Batch of {len(rows)} failed: {e}")
+            self.write_errors += 1
+            self._spill(rows)
+            return False
+        self.batches += 1
+        self.written += len(rows)
+        self.last_batch_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def _take(self, timeout: Optional[float]) -> List[Sequence]:
+        """Up to ``batch_size`` rows; waits ``timeout`` seconds for the first one."""
+        try:
+            rows = [self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _spill_files(self) -> List[str]:
+        """This worker's spill file plus any left behind by workers that have exited."""
+        own = self._own_spill_path()
+        files = [own] if os.path.exists(own) else []
+        for path in glob.glob(glob.escape(self.spill_path) + ".*"):
+            pid = path.rsplit(".", 1)[-1]
+            if path != own and pid.isdigit() and not _pid_alive(int(pid)):
+                files.append(path)
+        return files
+
+    def _replay_spill(self) -> None:
+        """Feed spilled rows back to the DB once the queue has drained.
+
+        Each file is claimed with an atomic rename to a name unique to this
+        process before it is read, so when several workers pick up the same
+        orphaned file only one of them replays it.
+        """
+        if not self.spill_path:
+            return
+        for path in self._spill_files():
+            claimed = f"{path}.replay-{os.getpid()}"
+            with self._spill_lock:
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue  # another worker claimed it first
+            with open(claimed, encoding="utf-8") as f:
+                rows = [tuple(json.loads(line)) for line in f if line.strip()]
+            os.remove(claimed)
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                if self._write(batch):
+                    self.replayed += len(batch)
+            if rows:
+                print(f"[ACCESS-LOG] Replayed {len(rows)} spilled record(s) from {path}")
+
+    def drain(self) -> int:
+        """Write everything queued right now; returns the rows written."""
+        before = self.written
+        while True:
+            rows = self._take(None)
+            if not rows:
+                break
+            self._write(rows)
+        return self.written - before
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            rows = self._take(self.flush_interval_ms / 1000.0)
+            if rows:
+                self._write(rows)
+            elif self.spill_path:
+                try:
+                    self._replay_spill()
+                except Exception as e:
+                    print(f"[ACCESS-LOG] Replay failed: {e}")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='access-log-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the writer thread and write whatever is still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        written = self.drain()
+        if written:
+            print(f"[ACCESS-LOG] Final drain wrote {written} record(s)")
+
+    def stats(self) -> Dict:
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'queued': self._queue.qsize(),
+            'queue_max': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'write_errors': self.write_errors,
+            'last_batch_ms': self.last_batch_ms,
+        }
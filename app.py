@@ -5,20 +5,23 @@ Plataforma Flask para visualização e gestão de créditos de carbono.
 """
 
 # 📦 Imports principais
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-import os, secrets, hashlib, traceback, shutil, sqlite3
-from flask import Response
+import os, secrets, hashlib, traceback, shutil, sqlite3, atexit, time
+from flask import Response, stream_with_context
 from flask import Flask, request, redirect, url_for, session, render_template
 import csv
 import io
+import json
+from dataclasses import asdict
 
 # 🗃️ Banco de dados
 from db import (
     DB_NAME, init_db, trial_exists, save_trial_to_db,
     get_trial_by_key, get_trial_by_key_fuzzy, count_trials, increment_queries_used,
-    get_all_trials, upgrade_db, seed_default_trial, list_trial_keys  # ✅ novo import
+    get_all_trials, upgrade_db, seed_default_trial, list_trial_keys,  # ✅ novo import
+    apply_usage, charge_trial, get_popular_queries, log_accesses, pool_stats
 )
 
 
@@ -32,7 +35,15 @@ from flask_cors import CORS
 from openpyxl import Workbook
 
 # 🤖 Agente bilíngue
-from enhanced_bilingual_agent import BilingualCarbonAgent
+from enhanced_bilingual_agent import BilingualCarbonAgent, SAMPLE_QUERIES
+from cache_warmer import CacheWarmer
+from http_optimizations import conditional_json, init_compression
+from static_assets import PrerenderedPages, init_static_assets
+from search_executor import SearchSaturated
+from query_analysis import analyze_query
+from search_cache import normalize_query
+from usage_accounting import UsageAccountant
+from access_log import AccessLogWriter
 
 # 🔧 Inicialização
 init_db()
@@ -57,9 +68,19 @@ load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "default-secret-key")
-app.config['EXPLAIN_TEMPLATE_LOADING'] = True
+# Rastreamento do carregamento de templates só em desenvolvimento (custa tempo em cada render)
+app.config['EXPLAIN_TEMPLATE_LOADING'] = os.getenv("EXPLAIN_TEMPLATE_LOADING", os.getenv("FLASK_DEBUG", "0")) == "1"
 
 CORS(app, supports_credentials=True)
+# 📦 Compressão gzip/brotli para respostas grandes (COMPRESS_ENABLED=0 desativa)
+init_compression(app)
+# 🗂️ Assets com hash de conteúdo e páginas estáticas pré-renderizadas no boot
+init_static_assets(app)
+static_pages = PrerenderedPages(
+    app,
+    ["home_template.html", "register_trial_template.html", "trial_access_template.html"],
+    enabled=os.getenv("PRERENDER_PAGES", "0" if os.getenv("FLASK_DEBUG", "0") == "1" else "1") == "1",
+)
 
 
 
@@ -68,6 +89,10 @@ MONGODB_URI = os.getenv("MONGODB_URI")
 JWT_SECRET = os.getenv("JWT_SECRET")
 API_PORT = int(os.getenv("API_PORT", 3000))
 
+# 📦 Busca em lote
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", 50))
+SEARCH_BATCH_TIMEOUT = float(os.getenv("SEARCH_BATCH_TIMEOUT_SECONDS", 25))
+
 # 🤖 Inicializa o agente
 try:
     carbon_agent = BilingualCarbonAgent()
@@ -76,6 +101,52 @@ except Exception as e:
     print(f"⚠️ BilingualCarbonAgent initialization failed: {e}")
     carbon_agent = None
 
+# 🔥 Aquecedor de cache: mantém as consultas mais populares sempre em cache
+cache_warmer = None
+if carbon_agent:
+    cache_warmer = CacheWarmer(
+        carbon_agent,
+        popular_queries=lambda limit: get_popular_queries(limit, days=int(os.getenv("SEARCH_WARM_LOOKBACK_DAYS", 7))),
+        seed_queries=SAMPLE_QUERIES,
+        interval_seconds=float(os.getenv("SEARCH_WARM_INTERVAL_SECONDS", 300)),
+        top_n=int(os.getenv("SEARCH_WARM_TOP_N", 20)),
+        provider_budget=int(os.getenv("SEARCH_WARM_PROVIDER_BUDGET", 40)),
+        margin_seconds=float(os.getenv("SEARCH_WARM_MARGIN_SECONDS", 60)),
+    )
+    cache_warmer.start()
+
+# 🧮 Contabilidade de uso em write-behind: cobra em memória, grava em lote
+usage_accountant = None
+if os.getenv("USAGE_WRITE_BEHIND", "1") not in ("0", "false", "False"):
+    usage_accountant = UsageAccountant(
+        load_trial=lambda key: get_trial_by_key(key) or get_trial_by_key_fuzzy(key),
+        apply_usage=apply_usage,
+        flush_interval_ms=float(os.getenv("USAGE_FLUSH_INTERVAL_MS", 250)),
+        flush_max_events=int(os.getenv("USAGE_FLUSH_MAX_EVENTS", 100)),
+        cache_ttl_seconds=float(os.getenv("USAGE_CACHE_TTL_SECONDS", 5)),
+        max_entries=int(os.getenv("USAGE_CACHE_MAX_ENTRIES", 10000)),
+    )
+    usage_accountant.start()
+    # Grava o que ainda estiver em buffer quando o worker encerrar
+    atexit.register(usage_accountant.stop)
+
+# 📒 Log de acessos assíncrono: fila em memória gravada em lote por uma thread
+access_log = None
+if os.getenv("ACCESS_LOG_ENABLED", "1") not in ("0", "false", "False"):
+    access_log = AccessLogWriter(
+        write_batch=log_accesses,
+        max_queue=int(os.getenv("ACCESS_LOG_QUEUE_MAX", 10000)),
+        batch_size=int(os.getenv("ACCESS_LOG_BATCH_SIZE", 500)),
+        flush_interval_ms=float(os.getenv("ACCESS_LOG_FLUSH_INTERVAL_MS", 1000)),
+        spill_path=os.getenv("ACCESS_LOG_SPILL_PATH"),
+    )
+    access_log.start()
+    atexit.register(access_log.stop)
+
+def read_trial(load):
+    """Lê o trial do DB somando o uso deste worker ainda não gravado."""
+    return usage_accountant.read(load) if usage_accountant else load()
+
 # 🔐 Geração de chave de trial
 def generate_trial_key(email):
     try:
@@ -88,11 +159,11 @@ def generate_trial_key(email):
 # 🌐 Rotas principais
 @app.route('/')
 def home():
-    return render_template("home_template.html")
+    return static_pages.serve("home_template.html")
 
 @app.route('/register-trial')
 def register_trial():
-    return render_template("register_trial_template.html")
+    return static_pages.serve("register_trial_template.html")
 
 @app.route('/api/register-trial', methods=['POST'])
 def api_register_trial():
@@ -171,7 +242,8 @@ def health_check():
         "active_trials": count_trials("active"),
         "server_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         "platform": "Carbon Credits Intelligence",
-    "version": "1.1.0"
+    "version": "1.1.0",
+        "search_saturated": carbon_agent.search_executor.saturated if carbon_agent else None
     })
 
 
@@ -212,7 +284,7 @@ def validate_trial():
         if not trial_key:
             return jsonify({"success": False, "message": "Trial key é obrigatório."}), 400
 
-        trial_data = get_trial_by_key(trial_key) or get_trial_by_key_fuzzy(trial_key)
+        trial_data = read_trial(lambda: get_trial_by_key(trial_key) or get_trial_by_key_fuzzy(trial_key))
         if not trial_data:
             return jsonify({"success": False, "message": "Trial key inválido."}), 401
 
@@ -237,10 +309,96 @@ def validate_trial():
 @app.route('/trial')
 def trial_access():
     """TRIAL ACCESS PAGE - CORRIGIDO"""
-    return render_template("trial_access_template.html")
+    return static_pages.serve("trial_access_template.html")
+
+
+from responses import format_agent_html, generate_fallback_response, render_agent_answer, render_cache_stats
+
+TRIAL_REJECTIONS = {
+    "not_found": "Trial key inválido.",
+    "expired": "Trial expirado. Faça upgrade para continuar.",
+    "limit_reached": "Limite de consultas atingido. Faça upgrade para continuar.",
+}
+
+
+def consume_trial_query(trial_key, count=1):
+    """Valida o trial e consome `count` consultas numa única operação atômica.
+
+    Retorna (trial_data atualizado, None) ou (None, mensagem de erro).
+    """
+    charge = usage_accountant.charge if usage_accountant else charge_trial
+    trial_data, reason = charge(trial_key, count)
+    if reason:
+        if reason == "not_found":
+            try:
+                print(f"[SEARCH] Trial not found for key: {trial_key} | DB: {os.path.abspath(DB_NAME)} | "
+                      f"Existing keys snapshot: {list_trial_keys()}")
+            except Exception:
+                pass
+        return None, TRIAL_REJECTIONS[reason]
+    return trial_data, None
+
+
+def client_ip():
+    """IP do cliente; atrás do proxy do Render vem em X-Forwarded-For."""
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    return forwarded.split(',')[0].strip() or request.remote_addr
+
+
+def record_search(trial_key, query, search_data=None, started=None):
+    """Enfileira o registro da busca em access_logs (sem tocar no DB nesta thread)."""
+    if not access_log:
+        return
+    started = started or g.get('request_started') or time.perf_counter()
+    search_data = search_data or {}
+    access_log.record(
+        trial_key, query, client_ip(),
+        latency_ms=int((time.perf_counter() - started) * 1000),
+        sources=search_data.get('sources_used') or [],
+        cache_hit=search_data.get('cache_status') in ('hit', 'stale', 'coalesced'),
+    )
+
+
+@app.before_request
+def mark_request_start():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def flush_search_records(response):
+    # Buscas anotadas pela rota em g.searches: latência medida até a resposta pronta
+    for entry in g.pop('searches', []):
+        record_search(entry['trial_key'], entry['query'], entry['search_data'])
+    return response
 
 
-from responses import format_agent_html, generate_fallback_response
+def note_search(trial_key, query, search_data=None):
+    """Anota a busca para ser registrada quando a resposta estiver pronta."""
+    entry = {'trial_key': trial_key, 'query': query, 'search_data': search_data}
+    g.setdefault('searches', []).append(entry)
+    return entry
+
+
+def render_search_result(query, analysis, search_data):
+    """Monta os campos de resposta (HTML + metadados) de uma busca concluída."""
+    return {
+        "success": True,
+        "intelligence": render_agent_answer(
+            query, search_data, analysis.language_name, analysis.location_specific, carbon_agent.format_response),
+        "language_detected": analysis.language_name,
+        "sources_count": search_data['total_found'],
+        "cache_status": search_data.get('cache_status')
+    }
+
+
+def render_fallback_result(query, analysis):
+    return {
+        "success": True,
+        "intelligence": generate_fallback_response(query, analysis),
+        "language_detected": "Portuguese (Brazilian)",
+        "sources_count": 0
+    }
+
 
 @app.route('/search', methods=['POST'])
 def search():
@@ -252,113 +410,190 @@ def search():
         if not query or not trial_key:
             return jsonify({"success": False, "message": "Query e trial key são obrigatórios."}), 400
 
-        # Log DB path and trial lookup for diagnostics
-        try:
-            print(f"[SEARCH] DB: {os.path.abspath(DB_NAME)} | trial_key: {trial_key}")
-        except Exception:
-            pass
-        trial_data = get_trial_by_key(trial_key) or get_trial_by_key_fuzzy(trial_key)
+        trial_data, validation_msg = consume_trial_query(trial_key)
         if not trial_data:
-            try:
-                print(f"[SEARCH] Trial not found for key: {trial_key}. Existing keys snapshot: {list_trial_keys()}")
-            except Exception:
-                pass
-        # Função utilitária para validar trial
-        def is_trial_valid(trial_data):
-            if not trial_data:
-                return False, "Trial key inválido."
-            end_date = datetime.fromisoformat(trial_data['end_date'])
-            days_remaining = (end_date - datetime.now()).days
-            if days_remaining < 0:
-                return False, "Trial expirado. Faça upgrade para continuar."
-            if trial_data.get('queries_used', 0) >= trial_data.get('queries_limit', 100):
-                return False, "Limite de consultas atingido. Faça upgrade para continuar."
-            return True, "Trial válido"
-
-        is_valid, validation_msg = is_trial_valid(trial_data)
-
-        if not is_valid:
             return jsonify({"success": False, "message": validation_msg}), 401
+        search_log = note_search(trial_data['trial_key'], query)
 
-        # ✅ Atualiza contador de uso usando a chave canônica do DB
-        canonical_key = trial_data.get('trial_key', trial_key)
-        try:
-            print(f"[SEARCH] Using canonical key for increment: {canonical_key}")
-        except Exception:
-            pass
-        increment_queries_used(canonical_key)
-        trial_data = get_trial_by_key(canonical_key)  # Recarrega dados atualizados
+        # 🧭 Análise da consulta feita uma única vez e repassada adiante
+        analysis = analyze_query(query)
 
         # 🤖 Chamada ao agente
         try:
             if carbon_agent:
-                language = carbon_agent.detect_language(query)
-                location_specific = carbon_agent.is_location_specific(query)
-                search_data = carbon_agent.comprehensive_search(query)
-                agent_response = carbon_agent.format_response(search_data)
-
-                language_name = "Portuguese (Brazilian)" if language == 'pt-BR' else "English (US)"
-                response_html = format_agent_html(query, agent_response, language_name, search_data, location_specific)
-
-                return jsonify({
-                    "success": True,
-                    "intelligence": response_html,
-                    "queries_remaining": trial_data['queries_limit'] - trial_data['queries_used'],
-                    "language_detected": language_name,
-                    "sources_count": search_data['total_found']
-                })
+                search_data = carbon_agent.comprehensive_search(query, analysis)
+                search_log['search_data'] = search_data
+                result = render_search_result(query, analysis, search_data)
             else:
                 # Agent indisponível: responder com fallback estático
-                response_html = generate_fallback_response(query)
-                return jsonify({
-                    "success": True,
-                    "intelligence": response_html,
-                    "queries_remaining": trial_data['queries_limit'] - trial_data['queries_used'],
-                    "language_detected": "Portuguese (Brazilian)",
-                    "sources_count": 0
-                })
+                result = render_fallback_result(query, analysis)
+
+        except SearchSaturated as saturated:
+            # Executor cheio: responde com fallback estático em vez de empilhar threads
+            print(f"[SEARCH] Shedding load: {saturated}")
+            result = render_fallback_result(query, analysis)
 
         except Exception as agent_error:
             print(f"⚠️ Erro no agente: {agent_error}")
-            response_html = generate_fallback_response(query)
-            return jsonify({
-                "success": True,
-                "intelligence": response_html,
-                "queries_remaining": trial_data['queries_limit'] - trial_data['queries_used'],
-                "language_detected": "Portuguese (Brazilian)",
-                "sources_count": 0
-            })
-
-        # Retorno de segurança (não deve ser alcançado)
-        response_html = generate_fallback_response(query)
+            result = render_fallback_result(query, analysis)
+
+        result["queries_remaining"] = trial_data['queries_limit'] - trial_data['queries_used']
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"❌ Erro crítico em /search: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "Erro interno no servidor."}), 500
+
+def _sse(event, payload):
+    """Formata um evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """📡 Variante de /search em Server-Sent Events.
+
+    Emite um evento `provider` assim que cada fonte responde, depois `summary`
+    (HTML formatado), `quota` (contadores finais) e `done`.
+    """
+    try:
+        data = request.get_json()
+        query = data.get('query', '').strip()
+        trial_key = data.get('trial_key', '').strip().upper()
+
+        if not query or not trial_key:
+            return jsonify({"success": False, "message": "Query e trial key são obrigatórios."}), 400
+
+        trial_data, validation_msg = consume_trial_query(trial_key)
+        if not trial_data:
+            return jsonify({"success": False, "message": validation_msg}), 401
+    except Exception as e:
+        print(f"❌ Erro crítico em /search/stream: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "Erro interno no servidor."}), 500
+
+    analysis = analyze_query(query)
+    started = g.request_started
+
+    def events():
+        search_data = None
+        yield _sse("meta", {
+            "language_detected": analysis.language_name,
+            "location_specific": analysis.location_specific
+        })
+        try:
+            if not carbon_agent:
+                raise RuntimeError("agent unavailable")
+            for kind, value in carbon_agent.stream_search(query, analysis):
+                if kind == "provider":
+                    source, results = value
+                    yield _sse("provider", {
+                        "source": source,
+                        "count": len(results),
+                        "results": [asdict(r) for r in results]
+                    })
+                else:
+                    search_data = value
+            summary = render_search_result(query, analysis, search_data)
+        except Exception as agent_error:
+            print(f"⚠️ Erro no agente (stream): {agent_error}")
+            summary = render_fallback_result(query, analysis)
+        yield _sse("summary", summary)
+        # O stream termina depois do after_request: registra aqui, com a latência até o resumo
+        record_search(trial_data['trial_key'], query, search_data, started)
+        yield _sse("quota", {
+            "queries_used": trial_data['queries_used'],
+            "queries_remaining": trial_data['queries_limit'] - trial_data['queries_used']
+        })
+        yield _sse("done", {})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """📦 Busca em lote: várias consultas com uma única chave de trial.
+
+    Remove duplicadas, cobra a cota de uma vez (tudo ou nada) e executa as
+    buscas em paralelo dentro de um prazo total.
+    """
+    try:
+        data = request.get_json()
+        trial_key = data.get('trial_key', '').strip().upper()
+        raw_queries = data.get('queries') or []
+
+        if not trial_key or not isinstance(raw_queries, list):
+            return jsonify({"success": False, "message": "Lista de queries e trial key são obrigatórios."}), 400
+
+        # Deduplica pela forma normalizada, preservando a ordem e o texto original
+        queries, seen = [], set()
+        for item in raw_queries:
+            query = str(item or '').strip()
+            if query and normalize_query(query) not in seen:
+                seen.add(normalize_query(query))
+                queries.append(query)
+        if not queries:
+            return jsonify({"success": False, "message": "Lista de queries e trial key são obrigatórios."}), 400
+        if len(queries) > SEARCH_BATCH_MAX:
+            return jsonify({"success": False, "message": f"Máximo de {SEARCH_BATCH_MAX} consultas por lote."}), 400
+
+        trial_data, validation_msg = consume_trial_query(trial_key, len(queries))
+        if not trial_data:
+            return jsonify({"success": False, "message": validation_msg}), 401
+
+        # 🧭 Cada consulta é analisada uma vez e a análise segue para o agente
+        analyses = {query: analyze_query(query) for query in queries}
+        outcomes = carbon_agent.batch_search(queries, SEARCH_BATCH_TIMEOUT, analyses) if carbon_agent else {}
+
+        results = []
+        for query in queries:
+            analysis = analyses[query]
+            outcome = outcomes.get(query)
+            note_search(trial_data['trial_key'], query, outcome if isinstance(outcome, dict) else None)
+            if isinstance(outcome, dict):
+                item = render_search_result(query, analysis, outcome)
+                item["status"] = "ok"
+            else:
+                if outcome is not None:
+                    print(f"⚠️ Lote: '{query}' sem resultado do agente: {outcome}")
+                item = render_fallback_result(query, analysis)
+                item["status"] = "timeout" if isinstance(outcome, TimeoutError) else "fallback"
+            item["query"] = query
+            results.append(item)
+
         return jsonify({
             "success": True,
-            "intelligence": response_html,
-            "queries_remaining": trial_data['queries_limit'] - trial_data['queries_used'],
-            "language_detected": "Portuguese (Brazilian)",
-            "sources_count": 0
+            "results": results,
+            "queries_charged": len(queries),
+            "duplicates_removed": len([q for q in raw_queries if str(q or '').strip()]) - len(queries),
+            "queries_remaining": trial_data['queries_limit'] - trial_data['queries_used']
         })
 
     except Exception as e:
-        print(f"❌ Erro crítico em /search: {e}")
+        print(f"❌ Erro crítico em /search/batch: {e}")
         print(traceback.format_exc())
         return jsonify({"success": False, "message": "Erro interno no servidor."}), 500
 
-@app.route('/api/trial-status', methods=['POST'])
+
+@app.route('/api/trial-status', methods=['GET', 'POST'])
 def api_trial_status():
-    """🔍 Consulta status de um trial via chave"""
+    """🔍 Consulta status de um trial via chave (GET ?trial_key=... aceita If-None-Match)"""
     try:
-        data = request.get_json()
+        data = request.args if request.method == 'GET' else request.get_json()
         trial_key = data.get('trial_key', '').strip().upper()
 
-        trial_data = get_trial_by_key(trial_key)
+        trial_data = read_trial(lambda: get_trial_by_key(trial_key))
         if not trial_data:
             return jsonify({"success": False, "message": "Trial não encontrado."}), 404
 
         end_date = datetime.fromisoformat(trial_data['end_date'])
         days_remaining = max(0, (end_date - datetime.now()).days)
 
-        return jsonify({
+        return conditional_json({
             "success": True,
             "status": trial_data.get('status', 'active'),
             "queries_used": trial_data['queries_used'],
@@ -380,7 +615,7 @@ def admin_trials():
     """🔐 Admin — Lista todos os trials registrados"""
     try:
         trials = get_all_trials()  # Retorna lista de dicts
-        return jsonify({
+        return conditional_json({
             "total_trials": len(trials),
             "trials": trials
         })
@@ -422,7 +657,7 @@ def admin_diagnostics():
     except Exception as e:
         disk_info = {"error": str(e), "dir": os.path.abspath(db_dir)}
 
-    return jsonify({
+    return conditional_json({
         "success": True,
         "db": {
             "path": os.path.abspath(db_path),
@@ -441,8 +676,14 @@ def admin_diagnostics():
             "active_trials": count_trials("active"),
             "expired_trials": count_trials("expired")
         },
+        "search": carbon_agent.search_stats() if carbon_agent else None,
+        "cache_warmer": cache_warmer.stats() if cache_warmer else None,
+        "usage_accounting": usage_accountant.stats() if usage_accountant else None,
+        "access_log": access_log.stats() if access_log else None,
+        "render_cache": render_cache_stats(),
+        "db_pool": pool_stats(),
         "server_time": datetime.utcnow().isoformat() + "Z"
-    })
+    }, volatile=("server_time", "db_pool"))
 
 
 
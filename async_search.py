@@ -0,0 +1,186 @@
+"""
+⚡ Asyncio Search Engine
+=======================
+Alternative to the per-request ThreadPoolExecutor fan-out used by
+``BilingualCarbonAgent``. Each worker runs one event loop in a daemon thread;
+every provider call is a coroutine on a shared aiohttp session, so thousands of
+in-flight calls cost no threads and are really cancelled when the budget expires.
+
+Enable with ``SEARCH_ENGINE=async`` (requires ``aiohttp``).
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency; the agent falls back to threads
+    aiohttp = None
+
+
+class AsyncSearchEngine:
+    """Runs provider fan-outs on a per-worker event loop."""
+
+    def __init__(self, agent, pool_size: int = 100, per_host: int = 20):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed")
+        self.agent = agent
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._loop = None
+        self._session = None  # only touched from the loop thread
+        self.in_flight = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Started lazily so the loop thread is created inside the gunicorn worker, not the master
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=run, name='search-event-loop', daemon=True).start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _fetch(self, name: str, query: str, language: str) -> List:
+        if name == 'duckduckgo':
+            # No async DDG client: run it in the loop's executor (cannot be interrupted mid-call)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.agent._search_duckduckgo, query)
+
+        spec = dict(self.agent._provider_request(name, query, language))
+        method = spec.pop('method')
+        url = spec.pop('url')
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.agent._provider_timeout(name))
+        started = time.monotonic()
+        try:
+            async with session.request(method, url, timeout=timeout, **spec) as response:
+                if response.status == 200:
+                    results = self.agent._parse_provider(name, await response.json(content_type=None))
+                    self.agent._record_provider_outcome(name, True, time.monotonic() - started)
+                    return results
+                self.agent._record_provider_outcome(name, False, time.monotonic() - started, status=response.status)
+                self.agent._report_http_error(name, response.status)
+                return []
+        except asyncio.CancelledError:
+            # Cut off by the search budget: counts as a slow failure for the breaker
+            self.agent._record_provider_outcome(name, False, time.monotonic() - started, error='Cancelled')
+            raise
+        except Exception as e:
+            self.agent._record_provider_outcome(name, False, time.monotonic() - started, error=type(e).__name__)
+            print(f"⚠️ {name} async search error: {e!r}")
+            return []
+
+    async def _gather(self, providers: List[str], query: str, language: str, budget: float,
+                      harvest: Optional[Callable] = None, on_result: Optional[Callable] = None) -> Dict[str, List]:
+        tasks = {asyncio.ensure_future(self._fetch(name, query, language)): name for name in providers}
+        if not tasks:
+            return {}
+        for task in tasks:
+            task.add_done_callback(self._task_done)
+        self.in_flight += len(tasks)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        results_map: Dict[str, List] = {}
+        pending = set(tasks)
+        try:
+            while pending and not self.agent._quorum_met(results_map):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                self._collect(tasks, done, results_map, on_result)
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+
+        if pending and loop.time() < deadline:
+            # Quorum reached: answer now, let the stragglers finish into the cache
+            self.agent._count_quorum('early_returns')
+            if harvest is not None:
+                asyncio.ensure_future(self._harvest(tasks, pending, dict(results_map), deadline, harvest))
+                return results_map
+        for task in pending:
+            print(f"⚠️ {tasks[task]} timed out after {budget:.1f}s, cancelling")
+            task.cancel()
+        return results_map
+
+    async def _harvest(self, tasks: Dict, pending, results_map: Dict[str, List], deadline: float,
+                       harvest: Callable) -> None:
+        loop = asyncio.get_running_loop()
+        done, not_done = await asyncio.wait(pending, timeout=max(0.0, deadline - loop.time()))
+        for task in not_done:
+            task.cancel()
+        before = len(results_map)
+        self._collect(tasks, done, results_map)
+        if len(results_map) > before:
+            try:
+                # Cache writes block, keep them off the loop
+                await loop.run_in_executor(None, harvest, results_map)
+            except Exception as e:
+                print(f"⚠️ Straggler harvest failed: {e!r}")
+
+    def _task_done(self, task: asyncio.Future) -> None:
+        self.in_flight -= 1
+        if task.cancelled():
+            self.cancelled += 1
+        else:
+            self.completed += 1
+
+    @staticmethod
+    def _collect(tasks: Dict, done, results_map: Dict[str, List], on_result: Optional[Callable] = None) -> None:
+        for task in done:
+            if not task.cancelled() and task.exception() is None and task.result():
+                results_map[tasks[task]] = task.result()
+                if on_result is not None:
+                    on_result(tasks[task], task.result())
+
+    def search(self, providers: List[str], query: str, language: str, budget: float,
+               harvest: Optional[Callable] = None, on_result: Optional[Callable] = None) -> Dict[str, List]:
+        """Blocking entry point for the (sync) Flask request thread.
+
+        ``on_result`` is called from the loop thread and must not block.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._gather(providers, query, language, budget, harvest, on_result), self._ensure_loop()
+        )
+        try:
+            return future.result(timeout=budget + 1.0)
+        except Exception as e:
+            future.cancel()
+            print(f"⚠️ Async search failed: {e!r}")
+            return {}
+
+    def stats(self) -> Dict:
+        return {
+            'type': 'async',
+            'loop_running': self._loop is not None and self._loop.is_running(),
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'pool_size': self.pool_size,
+        }
@@ -0,0 +1,269 @@
+"""
+⏱️ Microbenchmarks
+==================
+Times the hot functions of the request path against throwaway SQLite files:
+trial lookups and counters in ``db.py`` (and the write-behind usage buffer) at
+several table sizes, the local result index, query analysis, and response
+formatting. Results are written as JSON; ``--compare`` checks them against a
+saved baseline and exits non-zero when a case got slower than the threshold
+allows.
+
+Usage::
+
+    python benchmark.py --save                      # record benchmarks/baseline.json (reference machine)
+    python benchmark.py --save-new                  # add only cases the baseline doesn't have yet
+    python benchmark.py --save-new --update analyze_query  # ...and re-record cases a change sped up
+    python benchmark.py --compare                   # run and compare with it
+    python benchmark.py --sizes 1000 --threshold 0.5 --output run.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Sequence
+
+# Keep the app's modules away from the real DB, the network and background threads
+_tmp_dir = tempfile.mkdtemp(prefix="carbon-bench-")
+os.environ.setdefault("DB_PATH", os.path.join(_tmp_dir, "trials.db"))
+for _name, _value in (("SEARCH_USE_DDG", "0"), ("SEARCH_WARM_SESSIONS", "0"), ("SEARCH_SHARED_CACHE", "0"),
+                      ("SEARCH_QUOTA_ENABLED", "0"), ("SEARCH_INDEX_ENABLED", "0")):
+    os.environ.setdefault(_name, _value)
+
+import db  # noqa: E402
+from enhanced_bilingual_agent import BilingualCarbonAgent, SAMPLE_QUERIES, SearchResult  # noqa: E402
+from query_analysis import analyze_query  # noqa: E402
+from responses import format_agent_html  # noqa: E402
+from result_index import ResultIndex  # noqa: E402
+from usage_accounting import UsageAccountant  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> Dict:
+    """Time ``fn`` in ``repeats`` rounds of at least ``min_time`` seconds; microseconds per call."""
+    fn()  # warm-up (connections, caches, page cache)
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 4 or calls >= 1 << 20:
+            break
+        calls *= 4
+    per_call = [elapsed / calls]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        per_call.append((time.perf_counter() - started) / calls)
+    return {
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "min_us": round(min(per_call) * 1e6, 3),
+        "max_us": round(max(per_call) * 1e6, 3),
+        "calls_per_round": calls,
+        "rounds": repeats,
+    }
+
+
+def seed_trials(path: str, rows: int) -> List[str]:
+    """Create a trials DB with ``rows`` rows at ``path``; returns a few keys to look up."""
+    if os.path.exists(path):
+        os.remove(path)
+    db.DB_NAME = path
+    db.init_db()
+    db.upgrade_db()
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        """
+        INSERT INTO trials (email, trial_key, full_name, company, role, country, start_date, end_date,
+                            queries_used, queries_limit, registration_date, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (f"user{i}@bench.local", f"CARBON-{i:012X}", f"User {i}", "BenchCorp", "Analyst", "Brasil",
+             now.isoformat(), (now + timedelta(days=14 if i % 3 else -1)).isoformat(),
+             i % 100, 100, now.isoformat(), "active" if i % 3 else "expired")
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+    return [f"CARBON-{i:012X}" for i in (0, rows // 2, rows - 1)]
+
+
+def _sample_payload(query: str) -> Dict:
+    analysis = analyze_query(query)
+    return {
+        "query": query,
+        "language": analysis.language,
+        "results": [
+            SearchResult(f"Resultado {i} — {query}", f"https://example.org/{i}",
+                         "Créditos de carbono verificados (VCS, Gold Standard) negociados na B3 e BVRio. " * 3,
+                         "Serper API", 0.9)
+            for i in range(10)
+        ],
+        "sources_used": ["Serper API", "Tavily AI"],
+        "total_found": 10,
+    }
+
+
+def run(sizes: List[int], min_time: float = 0.2, repeats: int = 5) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+
+    def case(name: str, fn: Callable[[], object], **kw) -> None:
+        results[name] = measure(fn, kw.get("min_time", min_time), repeats)
+        print(f"  {name:<45} {results[name]['median_us']:>14.1f} µs")
+
+    for rows in sizes:
+        path = os.path.join(_tmp_dir, f"bench_{rows}.db")
+        print(f"📦 trials table with {rows:,} rows")
+        keys = seed_trials(path, rows)
+        middle = keys[1]
+        fuzzy = middle.lower().replace("-", "")
+        case(f"db.get_trial_by_key[{rows}]", lambda: db.get_trial_by_key(middle))
+        case(f"db.get_trial_by_key_fuzzy[{rows}]", lambda: db.get_trial_by_key_fuzzy(fuzzy))
+        case(f"db.increment_queries_used[{rows}]", lambda: db.increment_queries_used(middle))
+        # Limit out of reach so every timed call takes the charge path, not the rejection
+        conn = db.get_connection()
+        conn.execute("UPDATE trials SET queries_limit = ? WHERE trial_key = ?", (1 << 40, middle))
+        conn.commit()
+        case(f"db.charge_trial[{rows}]", lambda: db.charge_trial(fuzzy))
+        usage = UsageAccountant(db.get_trial_by_key, db.apply_usage, flush_interval_ms=0, flush_max_events=100)
+        case(f"usage.charge[{rows}]", lambda: usage.charge(middle))
+        case(f"db.count_trials[{rows}]", lambda: db.count_trials())
+        # Full-table read: one timed round is already long at large sizes
+        case(f"db.get_all_trials[{rows}]", lambda: db.get_all_trials(), min_time=min_time if rows <= 100000 else 0)
+        db.close_thread_connections()
+        os.remove(path)
+
+    print("📚 local result index")
+    index = ResultIndex(os.path.join(_tmp_dir, "bench_index.db"))
+    words = ("carbono mercado crédito floresta amazônia redd clima energia preço brasil verra gold standard "
+             "carbon market credits offset").split()
+    index.write([
+        ([{"title": " ".join(words[(i + j) % len(words)] for j in range(5)), "url": f"https://bench/{i}",
+           "snippet": " ".join(words[(i * 7 + j) % len(words)] for j in range(20)), "source": "Google"}],
+         "pt-BR" if i % 2 else "en", float(i))
+        for i in range(20000)
+    ])
+    fresh = [{"title": "Mercado de carbono", "url": f"https://bench/{i}", "snippet": "Preço", "source": "Serper API"}
+             for i in range(10)]
+    case("result_index.write[10 of 20000]", lambda: index.write([(fresh, "pt-BR", time.time())]))
+    case("result_index.search[20000]", lambda: index.search("Preço do carbono no mercado brasileiro", 5, "pt-BR"))
+
+    agent = BilingualCarbonAgent()
+    print("🧭 query analysis / 📝 formatting")
+    queries = SAMPLE_QUERIES
+    case("agent.detect_language[memoized]", lambda: [agent.detect_language(q) for q in queries])
+    case("analyze_query[uncached]", lambda: [analyze_query.__wrapped__(q) for q in queries])
+    for language, query in (("pt", queries[0]), ("en", queries[3])):
+        payload = _sample_payload(query)
+        analysis = analyze_query(query)
+        text = agent.format_response(payload)
+        case(f"agent.format_response[{language}]", lambda: agent.format_response(payload))
+        case(f"format_agent_html[{language}]", lambda: format_agent_html(
+            query, text, analysis.language_name, payload, analysis.location_specific))
+    return results
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Dict]:
+    """Cases whose median is more than ``threshold`` (0.25 = 25%) slower than the baseline."""
+    regressions = []
+    for name, stats in current.items():
+        before = baseline.get(name)
+        if not before or not before.get("median_us"):
+            continue
+        ratio = stats["median_us"] / before["median_us"]
+        if ratio > 1 + threshold:
+            regressions.append({"case": name, "baseline_us": before["median_us"],
+                                "current_us": stats["median_us"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+def merge_baseline(baseline: Dict, current: Dict[str, Dict], update: Sequence[str] = ()) -> List[str]:
+    """Add cases missing from ``baseline`` and replace those starting with an ``update`` prefix.
+
+    Every other case keeps its reference timing, so a run on a different or
+    noisier machine never rewrites numbers the change didn't touch.
+    """
+    results = baseline.setdefault("results", {})
+    changed = [name for name in current
+               if name not in results or any(name.startswith(prefix) for prefix in update)]
+    for name in changed:
+        results[name] = current[name]
+    return changed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for db.py, query analysis and formatting.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated trials table sizes")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timing round")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--save-new", action="store_true",
+                        help="Merge only new cases (and --update ones) into the existing baseline")
+    parser.add_argument("--update", action="append", default=[], metavar="PREFIX",
+                        help="With --save-new, also re-record cases starting with PREFIX (repeatable)")
+    parser.add_argument("--compare", action="store_true", help="Fail when slower than the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = {"environment": environment(), "results": run(sizes, args.min_time, args.repeats)}
+
+    for path in filter(None, (args.output, args.baseline if args.save else None)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Results written to {path}")
+
+    if args.save_new:
+        baseline = {"environment": report["environment"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        changed = merge_baseline(baseline, report["results"], args.update)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+        print(f"💾 {len(changed)} case(s) merged into {args.baseline}: {', '.join(changed) or 'none'}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"⚠️ No baseline at {args.baseline}; run with --save first")
+            return 2
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline.get("results", {}), args.threshold)
+        for item in regressions:
+            print(f"❌ {item['case']}: {item['baseline_us']} → {item['current_us']} µs (x{item['ratio']})")
+        if regressions:
+            return 1
+        print(f"✅ No regressions above {args.threshold:.0%} vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
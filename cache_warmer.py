@@ -0,0 +1,134 @@
+"""
+🔥 Search Cache Warmer
+======================
+Background thread that keeps the most requested queries (recent access-log
+leaders plus the advertised sample questions) in the search cache, refreshing
+each one shortly before it expires so users are answered from cache.
+
+Every cycle spends at most ``provider_budget`` provider calls, and yields to
+user traffic when the search executor is saturated. Nothing is warmed while the
+search cache is disabled (``SEARCH_CACHE_TTL_SECONDS=0``): results could not
+be stored, so every call would be wasted.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+from search_cache import normalize_query
+
+
+class CacheWarmer:
+    """Periodically calls ``agent.warm_query`` for the popular + seed queries."""
+
+    def __init__(self, agent, popular_queries: Callable[[int], List[str]], seed_queries: Iterable[str] = (),
+                 interval_seconds: float = 300.0, top_n: int = 20, provider_budget: int = 40,
+                 margin_seconds: float = 60.0):
+        self.agent = agent
+        self.popular_queries = popular_queries
+        self.seed_queries = list(seed_queries)
+        self.interval_seconds = float(interval_seconds)
+        self.top_n = int(top_n)
+        self.provider_budget = int(provider_budget)
+        self.margin_seconds = float(margin_seconds)
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.loaded = 0
+        self.fresh = 0
+        self.deferred = 0
+        self.errors = 0
+        self.last_run = None
+        ttl = self.agent.search_cache.ttl_seconds
+        if self.agent.search_cache.enabled and ttl < self.interval_seconds + self.margin_seconds:
+            print(f"[WARMER] ⚠️ Cache TTL ({ttl:.0f}s) is shorter than interval + margin "
+                  f"({self.interval_seconds + self.margin_seconds:.0f}s): every query is refreshed on every cycle")
+
+    def candidates(self) -> List[str]:
+        """Seed queries first, then the top-N logged queries, without normalized duplicates."""
+        try:
+            popular = self.popular_queries(self.top_n)
+        except Exception as e:
+            print(f"[WARMER] Could not read popular queries: {e}")
+            popular = []
+        seen, ordered = set(), []
+        for query in list(self.seed_queries) + list(popular):
+            normalized = normalize_query(query)
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                ordered.append(query)
+        return ordered
+
+    def run_once(self) -> Dict:
+        """One warming pass; returns what happened to each candidate query."""
+        outcome = {'fresh': 0, 'loaded': 0, 'refreshed': 0, 'deferred': 0, 'errors': 0, 'provider_calls': 0}
+        if not self.agent.search_cache.enabled:
+            return outcome
+        # Estimate before acquiring quota: one call per provider the agent could use
+        cost = max(1, len(self.agent._configured_providers()))
+        budget = self.provider_budget
+        for query in self.candidates():
+            if self._stop.is_set():
+                break
+            if budget < cost or self.agent.search_executor.saturated:
+                outcome['deferred'] += 1
+                continue
+            try:
+                status = self.agent.warm_query(query, refresh_ahead=self.interval_seconds + self.margin_seconds)
+            except Exception as e:
+                print(f"[WARMER] Refresh failed for '{query}': {e}")
+                outcome['errors'] += 1
+                continue
+            outcome[status] += 1
+            if status == 'refreshed':
+                budget -= cost
+                outcome['provider_calls'] += cost
+        self.cycles += 1
+        self.fresh += outcome['fresh']
+        self.loaded += outcome['loaded']
+        self.refreshed += outcome['refreshed']
+        self.deferred += outcome['deferred']
+        self.errors += outcome['errors']
+        self.last_run = time.time()
+        print(f"[WARMER] Cycle {self.cycles}: {outcome}")
+        return outcome
+
+    def _loop(self) -> None:
+        # Jitter so gunicorn workers booted together don't warm in lockstep
+        if self._stop.wait(random.uniform(1.0, min(30.0, self.interval_seconds))):
+            return
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[WARMER] Cycle failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        if not self.agent.search_cache.enabled:
+            print("[WARMER] Search cache disabled; not starting the warmer")
+            return
+        if self._thread is None and self.interval_seconds > 0:
+            self._thread = threading.Thread(target=self._loop, name='search-cache-warmer', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval_seconds': self.interval_seconds,
+            'top_n': self.top_n,
+            'provider_budget': self.provider_budget,
+            'seed_queries': len(self.seed_queries),
+            'cycles': self.cycles,
+            'fresh': self.fresh,
+            'loaded': self.loaded,
+            'refreshed': self.refreshed,
+            'deferred': self.deferred,
+            'errors': self.errors,
+            'last_run': self.last_run,
+        }
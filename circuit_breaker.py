@@ -0,0 +1,130 @@
+"""
+🔌 Provider Circuit Breaker
+===========================
+Per-provider breaker (closed → open → half-open) driven by a rolling window of
+call outcomes, plus a latency-adaptive timeout taken from the same window.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Trips when the recent error rate or slow-call rate crosses a threshold.
+
+    While open, calls are refused for ``open_seconds``; then one probe call is
+    let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_call_seconds: float = 4.0, slow_call_rate: float = 0.8,
+                 open_seconds: float = 30.0, min_timeout: float = 1.0, max_timeout: float = 5.0,
+                 timeout_percentile: float = 95.0, timeout_factor: float = 1.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.min_calls = max(1, int(min_calls))
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.min_timeout = min_timeout
+        self.max_timeout = max(min_timeout, max_timeout)
+        self.timeout_percentile = timeout_percentile
+        self.timeout_factor = timeout_factor
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=max(1, int(window)))  # (ok, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.trips = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_started = None
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be made now (claims the probe slot when half-open)."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN:
+                now = self._clock()
+                # A probe that never reported back (e.g. not admitted) expires after open_seconds
+                if self._probe_started is None or now - self._probe_started >= self.open_seconds:
+                    self._probe_started = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, latency: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._outcomes.append((ok, latency))
+            if not ok:
+                self.last_error = error
+            state = self._current_state()
+            if state == HALF_OPEN:
+                if ok and latency < self.slow_call_seconds:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            if state == CLOSED and len(self._outcomes) >= self.min_calls:
+                calls = len(self._outcomes)
+                failures = sum(1 for success, _ in self._outcomes if not success)
+                slow = sum(1 for _, elapsed in self._outcomes if elapsed >= self.slow_call_seconds)
+                if failures / calls >= self.failure_rate or slow / calls >= self.slow_call_rate:
+                    self._open()
+
+    def trip(self, error: Optional[str] = None) -> None:
+        """Open immediately, e.g. on a quota or auth error that will not clear in seconds."""
+        with self._lock:
+            self.last_error = error
+            self._open()
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probe_started = None
+        self.trips += 1
+
+    def timeout(self) -> float:
+        """Request timeout: a percentile of recent successful latencies times a safety factor."""
+        with self._lock:
+            latencies = sorted(elapsed for ok, elapsed in self._outcomes if ok)
+        if len(latencies) < self.min_calls:
+            return self.max_timeout
+        index = min(len(latencies) - 1, int(round(self.timeout_percentile / 100.0 * (len(latencies) - 1))))
+        return round(min(self.max_timeout, max(self.min_timeout, latencies[index] * self.timeout_factor)), 3)
+
+    def snapshot(self) -> Dict:
+        timeout = self.timeout()
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            return {
+                'state': self._current_state(),
+                'calls_in_window': calls,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'timeout_seconds': timeout,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'last_error': self.last_error,
+            }
@@ -2,6 +2,8 @@ import sqlite3
 import uuid
 import os
 import shutil
+import threading
+import weakref
 from datetime import datetime, timedelta
 
 # Choose a persistent path for SQLite when available (e.g., on Render with a mounted disk)
@@ -60,6 +62,106 @@ except Exception as e:
     print(f"[DB] Warning during writable preflight: {e}")
 
 
+class _PooledConnection(sqlite3.Connection):
+    """Persistent per-thread connection: `close()` only returns it to the pool.
+
+    Any transaction left open is rolled back, so callers keep the usual
+    connect -> execute -> commit -> close shape.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+            _count("rollbacks")
+        _count("released")
+
+    def really_close(self):
+        super().close()
+
+
+_pool_local = threading.local()
+_pool_lock = threading.Lock()
+_pool_connections = weakref.WeakSet()
+_pool_stats = {"opened": 0, "reused": 0, "released": 0, "rollbacks": 0}
+
+
+def _count(name):
+    # Connections of every thread update the same counters
+    with _pool_lock:
+        _pool_stats[name] += 1
+
+
+def _pragma_settings():
+    return {
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 64 * 1024 * 1024)),
+        # Negative cache_size is in KiB
+        "cache_size": -int(os.getenv("SQLITE_CACHE_KB", 8192)),
+    }
+
+
+def get_connection():
+    """Connection for DB_NAME owned by the calling thread, opened and tuned on first use.
+
+    WAL lets readers proceed while one writer commits; PRAGMAs are applied once per
+    connection and `cached_statements` keeps prepared statements across calls.
+    """
+    conns = getattr(_pool_local, "conns", None)
+    if conns is None or _pool_local.pid != os.getpid():
+        # First use in this thread, or a forked worker inherited the parent's state
+        conns = _pool_local.conns = {}
+        _pool_local.pid = os.getpid()
+    conn = conns.get(DB_NAME)
+    if conn is not None:
+        if conn.in_transaction:
+            # Left open by a call that raised before close()
+            conn.rollback()
+            _count("rollbacks")
+        _count("reused")
+        return conn
+
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=_pragma_settings()["busy_timeout"] / 1000.0,
+        factory=_PooledConnection,
+        cached_statements=int(os.getenv("SQLITE_STATEMENT_CACHE", 256)),
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    for pragma, value in _pragma_settings().items():
+        conn.execute(f"PRAGMA {pragma}={int(value)}")
+    conns[DB_NAME] = conn
+    with _pool_lock:
+        _pool_connections.add(conn)
+        _pool_stats["opened"] += 1
+    return conn
+
+
+def close_thread_connections():
+    """Really close the calling thread's connections (tests, shutdown)."""
+    for conn in (getattr(_pool_local, "conns", None) or {}).values():
+        conn.really_close()
+    _pool_local.conns = {}
+
+
+def pool_stats():
+    """Connection pool counters for diagnostics."""
+    with _pool_lock:
+        live = len(_pool_connections)
+        stats = dict(_pool_stats, live_connections=live, **_pragma_settings())
+    stats["statement_cache"] = int(os.getenv("SQLITE_STATEMENT_CACHE", 256))
+    try:
+        stats["journal_mode"] = get_connection().execute("PRAGMA journal_mode").fetchone()[0]
+    except Exception as e:
+        stats["error"] = str(e)
+    return stats
+
+
+# Forma canônica da chave para comparação tolerante (sem hífens, maiúsculas)
+NORMALIZED_KEY_SQL = "UPPER(REPLACE(trial_key, '-', ''))"
+
+
 def _migrate_bundled_db_if_needed():
     """Copy a bundled trials.db to the persistent DB path on first boot.
 
@@ -79,7 +181,7 @@ def _migrate_bundled_db_if_needed():
 def init_db():
     # One-time migration before opening the database
     _migrate_bundled_db_if_needed()
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS trials (
@@ -105,7 +207,7 @@ def init_db():
 
 
 def upgrade_db():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
 
     # Verifica colunas da tabela trials
@@ -132,12 +234,26 @@ def upgrade_db():
             )
         """)
 
+    # Colunas de métricas em access_logs (gravadas em lote por access_log.py)
+    cursor.execute("PRAGMA table_info(access_logs)")
+    log_columns = [col[1] for col in cursor.fetchall()]
+    for column, kind in (("latency_ms", "INTEGER"), ("sources", "TEXT"), ("cache_hit", "INTEGER")):
+        if column not in log_columns:
+            cursor.execute(f"ALTER TABLE access_logs ADD COLUMN {column} {kind}")
+    # get_popular_queries filtra por período
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_timestamp ON access_logs (timestamp)")
+
+    # Índice de expressão para a busca tolerante de chaves (get_trial_by_key_fuzzy).
+    # Criá-lo indexa as linhas existentes; o SQLite o mantém em cada INSERT/UPDATE.
+    # A expressão precisa ser idêntica à usada no WHERE da consulta.
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_trials_key_normalized ON trials ({NORMALIZED_KEY_SQL})")
+
     conn.commit()
     conn.close()
 
 
 def trial_exists(email):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT 1 FROM trials WHERE email = ?", (email,))
     exists = cursor.fetchone() is not None
@@ -146,7 +262,7 @@ def trial_exists(email):
 
 def save_trial_to_db(trial_data):
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO trials (
@@ -177,7 +293,7 @@ def save_trial_to_db(trial_data):
 
 
 def get_trial_by_key(trial_key):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT email, trial_key, queries_used, queries_limit, end_date
@@ -198,13 +314,13 @@ def get_trial_by_key(trial_key):
 
 def get_trial_by_key_fuzzy(trial_key):
     """Lookup trial by key ignoring case and hyphens to tolerate formatting differences."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT email, trial_key, queries_used, queries_limit, end_date
         FROM trials
-        WHERE UPPER(REPLACE(trial_key, '-', '')) = UPPER(REPLACE(?, '-', ''))
+        WHERE {NORMALIZED_KEY_SQL} = UPPER(REPLACE(?, '-', ''))
         LIMIT 1
         """,
         (trial_key,)
@@ -222,7 +338,7 @@ def get_trial_by_key_fuzzy(trial_key):
     return None
 
 def count_trials(status=None):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     if status:
         cursor.execute("SELECT COUNT(*) FROM trials WHERE status = ?", (status,))
@@ -233,7 +349,7 @@ def count_trials(status=None):
     return count
 
 def increment_queries_used(trial_key):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     cursor.execute("""
@@ -246,8 +362,74 @@ def increment_queries_used(trial_key):
     conn.close()
 
 
+def apply_usage(usage):
+    """Write buffered usage ({trial_key: (count, last_access)}) in one transaction."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        UPDATE trials
+        SET queries_used = queries_used + ?,
+            last_access = ?
+        WHERE trial_key = ?
+    """, [(count, last_access, trial_key) for trial_key, (count, last_access) in usage.items()])
+    conn.commit()
+    conn.close()
+
+
+def charge_trial(trial_key, count=1):
+    """Validate and charge `count` queries in a single conditional UPDATE.
+
+    The key is matched exactly first, then ignoring case and hyphens. Expiry and
+    quota are checked in the same statement that increments the counter, so
+    concurrent requests can never push `queries_used` past `queries_limit`.
+
+    Returns (trial, None) with the fresh counters, or (None, reason) where
+    reason is "not_found", "expired" or "limit_reached"; on failure nothing is
+    charged.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    now = datetime.now()
+    cursor.execute(
+        f"""
+        UPDATE trials
+        SET queries_used = queries_used + ?,
+            last_access = ?
+        WHERE id = (
+            SELECT id FROM trials WHERE trial_key = ?
+            UNION ALL
+            SELECT id FROM trials WHERE {NORMALIZED_KEY_SQL} = UPPER(REPLACE(?, '-', ''))
+            LIMIT 1
+        )
+        AND end_date >= ?
+        AND queries_used + ? <= queries_limit
+        RETURNING email, trial_key, queries_used, queries_limit, end_date
+        """,
+        (count, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), trial_key, trial_key, now.isoformat(), count)
+    )
+    row = cursor.fetchone()
+    conn.commit()
+    conn.close()
+    if row:
+        return {
+            "email": row[0],
+            "trial_key": row[1],
+            "queries_used": row[2],
+            "queries_limit": row[3],
+            "end_date": row[4]
+        }, None
+
+    # Rejected: one extra read (only on this path) to tell the caller why
+    trial = get_trial_by_key(trial_key) or get_trial_by_key_fuzzy(trial_key)
+    if not trial:
+        return None, "not_found"
+    if datetime.fromisoformat(trial["end_date"]) < now:
+        return None, "expired"
+    return None, "limit_reached"
+
+
 def get_all_trials():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT email, trial_key, full_name, company, role, country,
@@ -284,7 +466,7 @@ def list_trial_keys(limit=20):
     limit: cap number of keys returned to avoid huge log lines.
     """
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection()
         cur = conn.cursor()
         cur.execute("SELECT trial_key FROM trials ORDER BY id DESC LIMIT ?", (limit,))
         rows = cur.fetchall()
@@ -294,7 +476,7 @@ def list_trial_keys(limit=20):
         return []
 
 def log_access(trial_key, query, ip_address=None):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     cursor.execute("""
@@ -304,8 +486,42 @@ def log_access(trial_key, query, ip_address=None):
     conn.commit()
     conn.close()
 
+def log_accesses(rows):
+    """Insert many access-log rows in one transaction.
+
+    Each row is (trial_key, query, timestamp, ip_address, latency_ms, sources, cache_hit).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO access_logs (trial_key, query, timestamp, ip_address, latency_ms, sources, cache_hit)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+def get_popular_queries(limit=20, days=7):
+    """Consultas mais frequentes em access_logs nos últimos `days` dias.
+
+    Agrupa ignorando caixa/espaços nas pontas e devolve um texto representativo de cada grupo.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("""
+        SELECT MAX(query), COUNT(*) AS hits
+        FROM access_logs
+        WHERE timestamp >= ?
+        GROUP BY LOWER(TRIM(query))
+        ORDER BY hits DESC
+        LIMIT ?
+    """, (since, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
 def update_expired_trials():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     cursor.execute(
@@ -6,13 +6,115 @@ Multi-language Carbon Credits Intelligence Platform for global markets
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
 import json
 from datetime import datetime
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import logging
+import queue
+import threading
+import time
+
+from db import DB_NAME
+from search_cache import SearchCache, PersistentSearchCache, SingleFlight, make_cache_key
+from async_search import AsyncSearchEngine
+from search_executor import BoundedSearchExecutor, ProviderSaturated, SearchSaturated
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN
+from provider_quota import ProviderQuota
+from result_index import ResultIndex
+from markdown_render import prerender
+from query_analysis import (
+    BRAZILIAN_ENTITIES, PORTUGUESE_KEYWORDS, QueryAnalysis, analyze_query
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+PROVIDER_ENDPOINTS = {
+    'google': "https://www.googleapis.com/customsearch/v1",
+    'serper': "https://google.serper.dev/search",
+    'tavily': "https://api.tavily.com/search",
+}
+
+
+def _provider_endpoints() -> Dict[str, str]:
+    """Endpoints to call, honouring overrides (e.g. the local stand-in server).
+
+    ``SEARCH_<NAME>_URL`` replaces one endpoint; ``SEARCH_PROVIDER_BASE_URL`` sends
+    every provider to ``<base>/<name><real path>``.
+    """
+    base = os.getenv('SEARCH_PROVIDER_BASE_URL', '').rstrip('/')
+    endpoints = {}
+    for name, url in PROVIDER_ENDPOINTS.items():
+        override = os.getenv(f'SEARCH_{name.upper()}_URL')
+        if override:
+            endpoints[name] = override
+        elif base:
+            endpoints[name] = f"{base}/{name}{urlsplit(url).path}"
+        else:
+            endpoints[name] = url
+    return endpoints
+
+
+# (requests per second, requests per day) per provider; 0 = unlimited
+PROVIDER_QUOTA_DEFAULTS = {
+    'google': (10.0, 10000),
+    'serper': (5.0, 0),
+    'tavily': (5.0, 0),
+    'duckduckgo': (1.0, 0),
+}
+
+PROVIDER_LABELS = {
+    'google': "Google Custom Search",
+    'serper': "Serper API",
+    'tavily': "Tavily AI",
+    'duckduckgo': "DuckDuckGo",
+}
+
+# Source label for answers served from the local full-text index
+LOCAL_INDEX_LABEL = "Local Index"
+
+
+def _build_session(pool_size: int) -> requests.Session:
+    """Keep-alive session with a sized connection pool and a cheap retry policy.
+
+    Only connection failures and gateway errors are retried, once, so a retry
+    never eats a meaningful share of the per-provider timeout.
+    """
+    retry = Retry(
+        total=2,
+        connect=1,
+        read=0,
+        status=1,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'POST', 'HEAD']),
+        backoff_factor=0.1,
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
 
 @dataclass
 class SearchResult:
@@ -52,7 +154,93 @@ class BilingualCarbonAgent:
         self.use_ddg = os.getenv('SEARCH_USE_DDG', '1') not in ('0', 'false', 'False', '')
         # Suppress noisy logs from duckduckgo_search
         logging.getLogger('duckduckgo_search').setLevel(logging.WARNING)
+        # Result cache (SEARCH_CACHE_TTL_SECONDS=0 disables it)
+        self.search_cache = SearchCache(
+            max_entries=_env_int('SEARCH_CACHE_MAX_ENTRIES', 256),
+            ttl_seconds=_env_float('SEARCH_CACHE_TTL_SECONDS', 600.0),
+            stale_seconds=_env_float('SEARCH_CACHE_STALE_SECONDS', 3600.0),
+        )
+        # Shared on-disk tier next to the trials DB, visible to every gunicorn worker
+        self.shared_cache = None
+        if os.getenv('SEARCH_SHARED_CACHE', '1') not in ('0', 'false', 'False', ''):
+            self.shared_cache = PersistentSearchCache(
+                os.getenv('SEARCH_CACHE_DB_PATH') or os.path.join(os.path.dirname(DB_NAME), 'search_cache.db'),
+                ttl_seconds=self.search_cache.ttl_seconds,
+                stale_seconds=self.search_cache.stale_seconds,
+                max_bytes=int(_env_float('SEARCH_CACHE_MAX_MB', 50) * 1024 * 1024),
+            )
         
+        self.endpoints = _provider_endpoints()
+        if self.endpoints != PROVIDER_ENDPOINTS:
+            print(f"🔀 Provider endpoints overridden: {self.endpoints}")
+        # One long-lived HTTP session per provider, shared by all threads of this worker
+        pool_size = max(1, _env_int('SEARCH_HTTP_POOL_SIZE', 10))
+        self.sessions = {name: _build_session(pool_size) for name in PROVIDER_ENDPOINTS}
+        if os.getenv('SEARCH_WARM_SESSIONS', '1') not in ('0', 'false', 'False', ''):
+            threading.Thread(target=self._warm_sessions, name='search-session-warmup', daemon=True).start()
+        # Full-text index of every fetched result: offline answers and top-ups (SEARCH_INDEX_ENABLED=0 disables)
+        self.result_index = None
+        self.index_min_results = max(0, _env_int('SEARCH_INDEX_MIN_RESULTS', 3))
+        if os.getenv('SEARCH_INDEX_ENABLED', '1') not in ('0', 'false', 'False', ''):
+            self.result_index = ResultIndex(
+                os.getenv('SEARCH_INDEX_DB_PATH') or os.path.join(os.path.dirname(DB_NAME), 'search_index.db'),
+                max_rows=_env_int('SEARCH_INDEX_MAX_ROWS', 20000),
+                rank_candidates=_env_int('SEARCH_INDEX_RANK_CANDIDATES', 2000),
+            )
+        # Orchestration threads for /search/batch, created on first use
+        self._batch_pool = None
+        self._batch_lock = threading.Lock()
+        # Identical concurrent misses share one provider fan-out
+        self.single_flight = SingleFlight()
+        # Quorum mode: answer once N results or K providers are in (0 disables each rule)
+        self.quorum_results = max(0, _env_int('SEARCH_QUORUM_RESULTS', 0))
+        self.quorum_providers = max(0, _env_int('SEARCH_QUORUM_PROVIDERS', 0))
+        self.quorum_early_returns = 0
+        self.quorum_harvested = 0
+        self._quorum_lock = threading.Lock()  # counters are bumped from request and harvest threads
+        # Circuit breaker + adaptive timeout per provider
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                min_calls=_env_int('SEARCH_BREAKER_MIN_CALLS', 5),
+                failure_rate=_env_float('SEARCH_BREAKER_FAILURE_RATE', 0.5),
+                slow_call_seconds=_env_float('SEARCH_BREAKER_SLOW_SECONDS', 4.0),
+                open_seconds=_env_float('SEARCH_BREAKER_OPEN_SECONDS', 30.0),
+                min_timeout=_env_float('SEARCH_PROVIDER_TIMEOUT_MIN', 1.0),
+                max_timeout=_env_float('SEARCH_PROVIDER_TIMEOUT_MAX', 5.0),
+                timeout_percentile=_env_float('SEARCH_TIMEOUT_PERCENTILE', 95.0),
+            )
+            for name in PROVIDER_LABELS
+        }
+        # Per-provider rate/daily quotas shared by all workers (SEARCH_QUOTA_ENABLED=0 disables)
+        self.quota = None
+        if os.getenv('SEARCH_QUOTA_ENABLED', '1') not in ('0', 'false', 'False', ''):
+            self.quota = ProviderQuota(
+                os.getenv('SEARCH_QUOTA_DB_PATH') or os.path.join(os.path.dirname(DB_NAME), 'search_quota.db'),
+                {
+                    name: (
+                        _env_float(f'SEARCH_{name.upper()}_RATE_PER_SEC', rate),
+                        _env_int(f'SEARCH_{name.upper()}_DAILY_LIMIT', daily),
+                    )
+                    for name, (rate, daily) in PROVIDER_QUOTA_DEFAULTS.items()
+                },
+            )
+        # Shared, bounded pool for provider calls (admission control / backpressure)
+        self.search_executor = BoundedSearchExecutor(
+            max_workers=_env_int('SEARCH_MAX_WORKERS', 16),
+            max_queue=_env_int('SEARCH_MAX_QUEUE', 32),
+            per_provider=_env_int('SEARCH_PROVIDER_CONCURRENCY', 8),
+            batch_share=_env_float('SEARCH_BATCH_SHARE', 0.5),
+        )
+        # Fan-out engine: "threads" (default) or "async" (one event loop per worker, needs aiohttp)
+        self.async_engine = None
+        if os.getenv('SEARCH_ENGINE', 'threads').lower() in ('async', 'asyncio'):
+            try:
+                self.async_engine = AsyncSearchEngine(self, pool_size=_env_int('SEARCH_ASYNC_POOL_SIZE', 100))
+                print("✅ Asyncio search engine enabled")
+            except Exception as e:
+                print(f"⚠️ Asyncio search engine unavailable, using threads: {e}")
+
         if self.google_api_key and self.google_cse_id:
             print("✅ Google Custom Search API configured - Primary search engine")
         if self.serper_api_key:
@@ -62,18 +250,33 @@ class BilingualCarbonAgent:
         
         self.setup_language_detection()
         self.setup_portuguese_responses()
+        # Constant answer blocks are rendered to HTML once and reused by every response
+        prerender([self.pt_responses['welcome'], EN_WELCOME_RESPONSE, EN_ANALYSIS_BLOCK])
+
+    def _provider_configured(self, name: str) -> bool:
+        if name == 'google':
+            return bool(self.google_api_key and self.google_cse_id)
+        if name == 'serper':
+            return bool(self.serper_api_key)
+        if name == 'tavily':
+            return bool(self.tavily_api_key)
+        return False
+
+    def _warm_sessions(self) -> None:
+        """Open the TCP/TLS connection to each configured provider ahead of the first search."""
+        for name, endpoint in self.endpoints.items():
+            if not self._provider_configured(name):
+                continue
+            parts = urlsplit(endpoint)
+            try:
+                self.sessions[name].head(f"{parts.scheme}://{parts.netloc}/", timeout=3)
+            except Exception as e:
+                print(f"⚠️ Warm-up of {name} session failed: {e}")
 
     def setup_language_detection(self):
-        self.portuguese_keywords = [
-            'créditos', 'carbono', 'compensação', 'mercado', 'brasil', 'onde',
-            'como', 'posso', 'comprar', 'vender', 'preço', 'certificação',
-            'sustentabilidade', 'emissões', 'empresa', 'investimento',
-            'qual', 'quando', 'porque', 'quem', 'quanto', 'devo', 'preciso'
-        ]
-        self.brazilian_entities = [
-            'brasil', 'brazil', 'bvrio', 'b3', 'petrobras', 'bndes',
-            'amazônia', 'amazon', 'cerrado', 'mata atlântica'
-        ]
+        # Term lists live in query_analysis, compiled once into a single matcher
+        self.portuguese_keywords = PORTUGUESE_KEYWORDS
+        self.brazilian_entities = BRAZILIAN_ENTITIES
 
     def setup_portuguese_responses(self):
         self.pt_responses = {
@@ -124,167 +327,165 @@ Como posso ajudá-lo hoje?""",
     
     def detect_language(self, query: str) -> str:
         """Detect if query is in Portuguese or English"""
-        query_lower = query.lower()
-        
-        pt_score = 0
-        for keyword in self.portuguese_keywords:
-            if keyword in query_lower:
-                pt_score += 1
-        
-        for entity in self.brazilian_entities:
-            if entity in query_lower:
-                pt_score += 2
-        
-        return 'pt-BR' if pt_score > 0 else 'en'
+        return analyze_query(query).language
     
     def is_location_specific(self, query: str) -> bool:
         """Check if query is asking about a specific location"""
-        location_indicators = [
-            'where', 'onde', 'in brazil', 'no brasil', 'brasil',
-            'são paulo', 'rio de janeiro', 'amazon', 'amazônia'
-        ]
-        return any(indicator in query.lower() for indicator in location_indicators)
+        return analyze_query(query).location_specific
     
-    def _search_tavily(self, query: str, language: str) -> List[SearchResult]:
-        """Search using Tavily AI - best for location-specific queries"""
-        if not self.tavily_api_key:
-            return []
-        
-        try:
-            search_query = query
-            if language == 'pt-BR':
-                # Enhance Portuguese queries for better results
-                if 'brasil' in query.lower() or 'brazil' in query.lower():
-                    search_query += " Brasil carbon credits market BVRio B3"
-            
-            response = requests.post(
-                "https://api.tavily.com/search",
-                headers={"Authorization": f"Bearer {self.tavily_api_key}"},
-                json={
-                    "query": search_query,
-                    "search_depth": "advanced",
-                    "include_answer": True,
-                    "include_domains": ["bvrio.org", "b3.com.br", "verra.org", "goldstandard.org"],
-                    "max_results": 8
-                },
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                for item in data.get('results', []):
-                    results.append(SearchResult(
-                        title=item.get('title', ''),
-                        url=item.get('url', ''),
-                        snippet=item.get('content', '')[:300],
-                        source="Tavily AI",
-                        score=0.9
-                    ))
-                
-                return results[:5]
-                
-        except Exception as e:
-            print(f"⚠️ Tavily search error: {e}")
-            return []
-    
-    def _search_serper(self, query: str) -> List[SearchResult]:
-        """Search using Serper API (Google Search alternative)"""
-        if not self.serper_api_key:
-            return []
-            
-        try:
-            headers = {
+    # --- Provider request specs and parsers (shared by the thread and asyncio engines) ---
+
+    def _tavily_request(self, query: str, language: str) -> Dict:
+        search_query = query
+        if language == 'pt-BR':
+            # Enhance Portuguese queries for better results
+            if 'brasil' in query.lower() or 'brazil' in query.lower():
+                search_query += " Brasil carbon credits market BVRio B3"
+        return {
+            'method': 'POST',
+            'url': self.endpoints['tavily'],
+            'headers': {"Authorization": f"Bearer {self.tavily_api_key}"},
+            'json': {
+                "query": search_query,
+                "search_depth": "advanced",
+                "include_answer": True,
+                "include_domains": ["bvrio.org", "b3.com.br", "verra.org", "goldstandard.org"],
+                "max_results": 8
+            },
+        }
+
+    def _parse_tavily(self, data: Dict) -> List[SearchResult]:
+        results = []
+        for item in data.get('results', []):
+            results.append(SearchResult(
+                title=item.get('title', ''),
+                url=item.get('url', ''),
+                snippet=item.get('content', '')[:300],
+                source="Tavily AI",
+                score=0.9
+            ))
+        return results[:5]
+
+    def _serper_request(self, query: str, language: str) -> Dict:
+        return {
+            'method': 'POST',
+            'url': self.endpoints['serper'],
+            'headers': {
                 'X-API-KEY': self.serper_api_key,
                 'Content-Type': 'application/json'
-            }
-            
-            payload = {
+            },
+            'json': {
                 'q': query,
                 'num': 8,
                 'autocorrect': True,
                 'safe': 'active'
-            }
-            
-            response = requests.post(
-                "https://google.serper.dev/search",
-                headers=headers,
-                json=payload,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                for item in data.get('organic', []):
-                    results.append(SearchResult(
-                        title=item.get('title', ''),
-                        url=item.get('link', ''),
-                        snippet=item.get('snippet', '')[:300],
-                        source="Serper API",
-                        score=0.95
-                    ))
-                
-                return results[:5]
-            else:
-                print(f"⚠️ Serper API returned status {response.status_code}")
-                return []
-                
-        except Exception as e:
-            print(f"⚠️ Serper search error: {e}")
-            return []
-    
-    def _search_google(self, query: str) -> List[SearchResult]:
-        """Search using Google Custom Search API with enhanced error handling"""
-        if not self.google_api_key or not self.google_cse_id:
-            print("⚠️ Google API credentials not configured, skipping...")
-            return []
-        
-        try:
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {
+            },
+        }
+
+    def _parse_serper(self, data: Dict) -> List[SearchResult]:
+        results = []
+        for item in data.get('organic', []):
+            results.append(SearchResult(
+                title=item.get('title', ''),
+                url=item.get('link', ''),
+                snippet=item.get('snippet', '')[:300],
+                source="Serper API",
+                score=0.95
+            ))
+        return results[:5]
+
+    def _google_request(self, query: str, language: str) -> Dict:
+        return {
+            'method': 'GET',
+            'url': self.endpoints['google'],
+            'params': {
                 'key': self.google_api_key,
                 'cx': self.google_cse_id,
                 'q': query,
                 'num': 5
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            
+            },
+        }
+
+    def _parse_google(self, data: Dict) -> List[SearchResult]:
+        results = []
+        for item in data.get('items', []):
+            results.append(SearchResult(
+                title=item.get('title', ''),
+                url=item.get('link', ''),
+                snippet=item.get('snippet', ''),
+                source="Google Custom Search",
+                score=0.8
+            ))
+        print(f"✅ Google Custom Search: Found {len(results)} results")
+        return results
+
+    def _report_http_error(self, name: str, status: int) -> None:
+        if name == 'google' and status == 403:
+            print("❌ Google API Error (403): API blocked or quota exceeded")
+            print("🔧 Solution: Check API billing, quotas, or use alternative search")
+        elif name == 'google' and status == 429:
+            print("⚠️ Google API Rate Limit: Too many requests")
+        else:
+            print(f"⚠️ {PROVIDER_LABELS[name]} returned status {status}")
+
+    def _provider_request(self, name: str, query: str, language: str) -> Dict:
+        return getattr(self, f'_{name}_request')(query, language)
+
+    def _parse_provider(self, name: str, data: Dict) -> List[SearchResult]:
+        return getattr(self, f'_parse_{name}')(data)
+
+    def _provider_timeout(self, name: str) -> float:
+        return self.breakers[name].timeout()
+
+    def _record_provider_outcome(self, name: str, ok: bool, latency: float,
+                                 status: Optional[int] = None, error: Optional[str] = None) -> None:
+        breaker = self.breakers[name]
+        if status in (403, 429):
+            # Quota / auth problems don't clear within seconds: stop calling right away
+            breaker.trip(f"HTTP {status}")
+        else:
+            breaker.record(ok, latency, error or (f"HTTP {status}" if status else None))
+
+    def _http_search(self, name: str, query: str, language: str) -> List[SearchResult]:
+        """Run one provider call over its pooled session and parse the response."""
+        spec = self._provider_request(name, query, language)
+        started = time.monotonic()
+        try:
+            response = self.sessions[name].request(timeout=self._provider_timeout(name), **spec)
             if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                for item in data.get('items', []):
-                    results.append(SearchResult(
-                        title=item.get('title', ''),
-                        url=item.get('link', ''),
-                        snippet=item.get('snippet', ''),
-                        source="Google Custom Search",
-                        score=0.8
-                    ))
-                
-                print(f"✅ Google Custom Search: Found {len(results)} results")
+                results = self._parse_provider(name, response.json())
+                self._record_provider_outcome(name, True, time.monotonic() - started)
                 return results
-            elif response.status_code == 403:
-                print("❌ Google API Error (403): API blocked or quota exceeded")
-                print("🔧 Solution: Check API billing, quotas, or use alternative search")
-                return []
-            elif response.status_code == 429:
-                print("⚠️ Google API Rate Limit: Too many requests")
-                return []
-            else:
-                print(f"⚠️ Google API Error: {response.status_code}")
-                return []
-                
+            self._record_provider_outcome(name, False, time.monotonic() - started, status=response.status_code)
+            self._report_http_error(name, response.status_code)
+            return []
         except Exception as e:
-            print(f"⚠️ Google search error: {e}")
+            self._record_provider_outcome(name, False, time.monotonic() - started, error=type(e).__name__)
+            print(f"⚠️ {PROVIDER_LABELS[name]} search error: {e}")
             return []
-    
+
+    def _search_tavily(self, query: str, language: str) -> List[SearchResult]:
+        """Search using Tavily AI - best for location-specific queries"""
+        if not self.tavily_api_key:
+            return []
+        return self._http_search('tavily', query, language)
+
+    def _search_serper(self, query: str) -> List[SearchResult]:
+        """Search using Serper API (Google Search alternative)"""
+        if not self.serper_api_key:
+            return []
+        return self._http_search('serper', query, 'en')
+
+    def _search_google(self, query: str) -> List[SearchResult]:
+        """Search using Google Custom Search API with enhanced error handling"""
+        if not self.google_api_key or not self.google_cse_id:
+            print("⚠️ Google API credentials not configured, skipping...")
+            return []
+        return self._http_search('google', query, 'en')
+
     def _search_duckduckgo(self, query: str) -> List[SearchResult]:
         """Fallback search using DuckDuckGo"""
+        started = time.monotonic()
         try:
             from duckduckgo_search import DDGS
 
@@ -299,79 +500,376 @@ Como posso ajudá-lo hoje?""",
                         score=0.6
                     ))
 
+            self._record_provider_outcome('duckduckgo', True, time.monotonic() - started)
             return results
 
         except Exception as e:
             # Treat DDG issues as non-fatal
+            self._record_provider_outcome('duckduckgo', False, time.monotonic() - started, error=type(e).__name__)
             print(f"⚠️ DuckDuckGo fallback unavailable: {e}")
             return []
+
+    def _configured_providers(self) -> List[str]:
+        """Providers with credentials (plus DDG when enabled), ignoring breakers and quotas."""
+        candidates = [name for name in ('google', 'serper', 'tavily') if self._provider_configured(name)]
+        # DDG as optional final fallback
+        if self.use_ddg:
+            candidates.append('duckduckgo')
+        return candidates
+
+    def _planned_providers(self) -> List[str]:
+        """Providers to call for a search, in merge-priority order."""
+        planned = []
+        for name in self._configured_providers():
+            if not self.breakers[name].allow():
+                print(f"⏸️ {PROVIDER_LABELS[name]} skipped: circuit open")
+            elif self.quota and not self.quota.try_acquire(name):
+                print(f"⏸️ {PROVIDER_LABELS[name]} skipped: quota exhausted")
+            else:
+                planned.append(name)
+        return planned
+
+    def _call_provider(self, name: str, query: str, language: str) -> List[SearchResult]:
+        if name == 'google':
+            return self._search_google(query)
+        if name == 'serper':
+            return self._search_serper(query)
+        if name == 'tavily':
+            return self._search_tavily(query, language)
+        return self._search_duckduckgo(query)
     
-    def comprehensive_search(self, query: str) -> Dict:
-        """Perform searches in parallel within a global time budget to avoid timeouts."""
-        language = self.detect_language(query)
-        is_location_query = self.is_location_specific(query)
-        print(f"🔍 Language: {'Portuguese' if language == 'pt-BR' else 'English'}")
-        print(f"📍 Location-specific: {'Yes' if is_location_query else 'No'}")
+    def comprehensive_search(self, query: str, analysis: Optional[QueryAnalysis] = None, batch: bool = False) -> Dict:
+        """Answer from the result cache when possible, otherwise search all providers.
 
-        tasks = []
-        results_map: Dict[str, List[SearchResult]] = {}
+        Stale entries are returned immediately while a background thread refreshes them;
+        concurrent misses for the same query join a single in-flight search.
+        Sparse or failed searches are topped up from the local result index.
+        Raises ``SearchSaturated`` on a miss when the shared executor is full and
+        the index has nothing for the query. ``batch=True`` submits provider calls
+        in the executor's lower-priority batch lane.
+        """
+        analysis = analysis or analyze_query(query)
+        key = make_cache_key(query, analysis.language)
+        cached = self._lookup_cache(key, query)
+        if cached is not None:
+            return cached
+
+        def search_and_store():
+            search_data = self._search_providers(
+                query, on_complete=lambda full: self._store_in_cache(key, full), analysis=analysis, batch=batch)
+            self._store_in_cache(key, search_data)
+            return search_data
+
+        search_data, shared = self.single_flight.do(key, search_and_store, timeout=self.global_timeout + 5)
+        # A shared payload carries the leader's wording; report this caller's
+        return dict(search_data, query=query, cache_status='coalesced' if shared else 'miss')
+
+    def stream_search(self, query: str, analysis: Optional[QueryAnalysis] = None) -> Iterator[Tuple[str, object]]:
+        """Like ``comprehensive_search`` but yields progress for streaming clients.
 
-        def submit(executor, name, fn, *args):
+        Yields ``('provider', (label, results))`` as each provider answers, then
+        ``('complete', search_data)``. Cache hits yield only the final event.
+        """
+        analysis = analysis or analyze_query(query)
+        key = make_cache_key(query, analysis.language)
+        cached = self._lookup_cache(key, query)
+        if cached is not None:
+            yield 'complete', cached
+            return
+
+        events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+
+        def run():
             try:
-                future = executor.submit(fn, *args)
-                tasks.append((name, future))
+                search_data = self._search_providers(
+                    query,
+                    on_complete=lambda full: self._store_in_cache(key, full),
+                    analysis=analysis,
+                    on_result=lambda name, results: events.put(('provider', (PROVIDER_LABELS[name], results))),
+                )
+                self._store_in_cache(key, search_data)
+                events.put(('complete', dict(search_data, cache_status='miss')))
             except Exception as e:
-                print(f"⚠️ Failed to submit task {name}: {e}")
-
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            if self.google_api_key and self.google_cse_id:
-                submit(executor, 'Google Custom Search', self._search_google, query)
-            if self.serper_api_key:
-                submit(executor, 'Serper API', self._search_serper, query)
-            # Tavily: only if location or we need more coverage
-            submit(executor, 'Tavily AI', self._search_tavily, query, language)
-            # DDG as optional final fallback
-            if self.use_ddg:
-                submit(executor, 'DuckDuckGo', self._search_duckduckgo, query)
+                events.put(('error', e))
+
+        threading.Thread(target=run, name='search-stream', daemon=True).start()
+        while True:
+            kind, value = events.get(timeout=self.global_timeout + 5)
+            if kind == 'error':
+                raise value
+            yield kind, value
+            if kind == 'complete':
+                return
+
+    def batch_search(self, queries: List[str], budget: float,
+                     analyses: Optional[Dict[str, QueryAnalysis]] = None) -> Dict[str, object]:
+        """Run ``comprehensive_search`` for several queries concurrently under one deadline.
 
+        ``analyses`` maps queries to their ``analyze_query`` result when the caller
+        already has it. Returns ``{query: payload}``; a query that failed or missed the deadline maps
+        to the exception (``TimeoutError`` for the latter) instead of a payload.
+        """
+        with self._batch_lock:
+            if self._batch_pool is None:
+                self._batch_pool = ThreadPoolExecutor(
+                    max_workers=max(1, _env_int('SEARCH_BATCH_CONCURRENCY', 8)),
+                    thread_name_prefix='search-batch',
+                )
+        analyses = analyses or {}
+        futures = {
+            self._batch_pool.submit(self.comprehensive_search, query, analyses.get(query), True): query
+            for query in queries
+        }
+        done, not_done = wait(futures, timeout=budget)
+        outcomes: Dict[str, object] = {}
+        for future in done:
             try:
-                deadline = self.global_timeout
-                start = datetime.now()
-                for name, future in tasks:
-                    remaining = max(0.1, deadline - (datetime.now() - start).total_seconds())
-                    if remaining <= 0:
-                        break
-                    try:
-                        data = future.result(timeout=remaining)
-                        if data:
-                            results_map[name] = data
-                    except Exception as e:
-                        print(f"⚠️ {name} timed out/failed: {e}")
+                outcomes[futures[future]] = future.result()
+            except Exception as e:
+                outcomes[futures[future]] = e
+        for future in not_done:
+            future.cancel()
+            outcomes[futures[future]] = TimeoutError(f"batch budget of {budget:.0f}s exceeded")
+        return outcomes
+
+    def warm_query(self, query: str, refresh_ahead: float) -> str:
+        """Make sure ``query`` stays cached for at least ``refresh_ahead`` more seconds.
+
+        Returns ``'fresh'`` (nothing to do), ``'loaded'`` (copied from the shared tier,
+        e.g. another worker refreshed it) or ``'refreshed'`` (providers were called).
+        """
+        key = make_cache_key(query, analyze_query(query).language)
+        threshold = max(0.0, self.search_cache.ttl_seconds - refresh_ahead)
+        age = self.search_cache.age(key)
+        if age is not None and age < threshold:
+            return 'fresh'
+        if self.shared_cache:
+            found = self.shared_cache.get(key)
+            if found and found[1] < threshold:
+                stored, shared_age = found
+                self.search_cache.set(key, self._payload_from_cache(stored), age=shared_age)
+                return 'loaded'
+
+        def search_and_store():
+            search_data = self._search_providers(query, on_complete=lambda full: self._store_in_cache(key, full))
+            self._store_in_cache(key, search_data)
+            return search_data
+
+        self.single_flight.do(key, search_and_store, timeout=self.global_timeout + 5)
+        return 'refreshed'
+
+    def _lookup_cache(self, key: str, query: str) -> Optional[Dict]:
+        """Cached payload (memory, then shared tier) tagged with its cache status, or None."""
+        cached, is_stale = self.search_cache.get(key)
+        if cached is None and self.shared_cache:
+            found = self.shared_cache.get(key)
+            if found:
+                stored, age = found
+                cached = self._payload_from_cache(stored)
+                is_stale = age > self.search_cache.ttl_seconds
+                self.search_cache.set(key, cached, age=age)
+        if cached is None:
+            return None
+        print(f"🗄️ Search cache {'stale' if is_stale else 'hit'}: {query}")
+        if is_stale:
+            self._refresh_in_background(key, query)
+        # The key folds case and spacing, so the entry may hold another caller's wording
+        return dict(cached, query=query, cache_status='stale' if is_stale else 'hit')
+
+    def _store_in_cache(self, key: str, search_data: Dict) -> None:
+        # Empty or index-only payloads usually mean every provider failed; don't pin them
+        if search_data.get('results') and not search_data.get('offline'):
+            self.search_cache.set(key, search_data)
+            if self.shared_cache:
+                self.shared_cache.set(key, self._payload_to_cache(search_data))
+
+    @staticmethod
+    def _payload_to_cache(search_data: Dict) -> Dict:
+        return dict(search_data, results=[asdict(r) for r in search_data['results']])
+
+    @staticmethod
+    def _payload_from_cache(stored: Dict) -> Dict:
+        return dict(stored, results=[SearchResult(**r) for r in stored.get('results', [])])
+
+    def _refresh_in_background(self, key: str, query: str) -> None:
+        if not self.search_cache.begin_refresh(key):
+            return
+
+        def refresh():
+            try:
+                self._store_in_cache(key, self._search_providers(
+                    query, on_complete=lambda full: self._store_in_cache(key, full)))
+            except Exception as e:
+                print(f"⚠️ Background cache refresh failed: {e}")
             finally:
-                # Best-effort: cancel unfinished tasks
-                for _, f in tasks:
-                    if not f.done():
-                        f.cancel()
+                self.search_cache.end_refresh(key)
+
+        threading.Thread(target=refresh, name='search-cache-refresh', daemon=True).start()
+
+    def _search_providers(self, query: str, on_complete: Optional[Callable[[Dict], None]] = None,
+                          analysis: Optional[QueryAnalysis] = None,
+                          on_result: Optional[Callable[[str, List[SearchResult]], None]] = None,
+                          batch: bool = False) -> Dict:
+        """Perform searches in parallel within a global time budget to avoid timeouts.
+
+        In quorum mode the payload may be returned before every provider answered;
+        ``on_complete`` then receives the fuller payload once the stragglers finish.
+        ``on_result(provider, results)`` is called as each provider returns results.
+        """
+        analysis = analysis or analyze_query(query)
+        language = analysis.language
+        is_location_query = analysis.location_specific
+        print(f"🔍 Language: {'Portuguese' if language == 'pt-BR' else 'English'}")
+        print(f"📍 Location-specific: {'Yes' if is_location_query else 'No'}")
+
+        harvest = None
+        if on_complete is not None:
+            def harvest(results_map):
+                self._count_quorum('harvested')
+                on_complete(self._build_payload(query, language, results_map))
+
+        providers = self._planned_providers()
+        try:
+            if self.async_engine is not None:
+                results_map = self.async_engine.search(providers, query, language, self.global_timeout, harvest, on_result)
+            else:
+                results_map = self._search_with_threads(providers, query, language, harvest, on_result, batch)
+        except SearchSaturated:
+            # Overloaded: answer from the local index if it knows anything about the query
+            index_hits = self._index_lookup(query, language, self.index_min_results)
+            if not index_hits:
+                raise
+            return self._build_payload(query, language, {}, index_hits)
+        return self._build_payload(query, language, results_map)
 
+    def _count_quorum(self, counter: str) -> None:
+        with self._quorum_lock:
+            setattr(self, f'quorum_{counter}', getattr(self, f'quorum_{counter}') + 1)
+
+    def _quorum_met(self, results_map: Dict[str, List[SearchResult]]) -> bool:
+        """True once enough results or providers are in to answer without the stragglers."""
+        if self.quorum_results > 0 and sum(len(r) for r in results_map.values()) >= self.quorum_results:
+            return True
+        return self.quorum_providers > 0 and len(results_map) >= self.quorum_providers
+
+    def _search_with_threads(self, providers: List[str], query: str, language: str,
+                             harvest: Optional[Callable] = None,
+                             on_result: Optional[Callable] = None,
+                             batch: bool = False) -> Dict[str, List[SearchResult]]:
+        results_map: Dict[str, List[SearchResult]] = {}
+        pending = {}
+        for name in providers:
+            try:
+                pending[self.search_executor.submit(name, self._call_provider, name, query, language, batch=batch)] = name
+            except ProviderSaturated as e:
+                print(f"⚠️ Skipping {PROVIDER_LABELS[name]}: {e}")
+            except SearchSaturated:
+                if not pending:
+                    raise
+                break
+            except Exception as e:
+                print(f"⚠️ Failed to submit task {PROVIDER_LABELS[name]}: {e}")
+
+        deadline = time.monotonic() + self.global_timeout
+        # Handle providers in completion order so a slow one never delays the others
+        while pending and not self._quorum_met(results_map):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    data = future.result()
+                    if data:
+                        results_map[name] = data
+                        if on_result is not None:
+                            on_result(name, data)
+                except Exception as e:
+                    print(f"⚠️ {PROVIDER_LABELS[name]} failed: {e}")
+
+        if pending and time.monotonic() < deadline:
+            # Quorum reached: answer now, let the stragglers finish into the cache
+            self._count_quorum('early_returns')
+            if harvest is not None:
+                self._harvest_stragglers(pending, dict(results_map), deadline, harvest)
+        else:
+            for future, name in pending.items():
+                print(f"⚠️ {PROVIDER_LABELS[name]} timed out")
+                # Queued calls are dropped; running ones finish but keep holding their executor slot
+                future.cancel()
+
+        return results_map
+
+    def _harvest_stragglers(self, pending: Dict, results_map: Dict[str, List[SearchResult]],
+                            deadline: float, harvest: Callable) -> None:
+        """Collect providers still running after a quorum return and hand the merged map to ``harvest``."""
+        def collect():
+            done, not_done = wait(pending, timeout=max(0.0, deadline - time.monotonic()))
+            added = False
+            for future in done:
+                try:
+                    data = future.result()
+                    if data:
+                        results_map[pending[future]] = data
+                        added = True
+                except Exception:
+                    pass
+            for future in not_done:
+                future.cancel()
+            if added:
+                try:
+                    harvest(results_map)
+                except Exception as e:
+                    print(f"⚠️ Straggler harvest failed: {e}")
+
+        threading.Thread(target=collect, name='search-harvest', daemon=True).start()
+
+    def _build_payload(self, query: str, language: str, results_map: Dict[str, List[SearchResult]],
+                       index_hits: Optional[List[SearchResult]] = None) -> Dict:
         all_results: List[SearchResult] = []
         sources_used: List[str] = []
         # Preserve a priority order when merging
-        for key in ["Google Custom Search", "Serper API", "Tavily AI", "DuckDuckGo"]:
-            if key in results_map and results_map[key]:
-                sources_used.append(key)
-                all_results.extend(results_map[key])
+        for name, label in PROVIDER_LABELS.items():
+            if results_map.get(name):
+                sources_used.append(label)
+                all_results.extend(results_map[name])
+
+        fetched = list(all_results)
+        if len(all_results) < self.index_min_results:
+            # Sparse or no provider answer: top up from the local index
+            seen = {r.url for r in all_results}
+            if index_hits is None:
+                index_hits = self._index_lookup(query, language, self.index_min_results)
+            extra = [r for r in index_hits if r.url not in seen]
+            if extra:
+                sources_used.append(LOCAL_INDEX_LABEL)
+                all_results.extend(extra[:self.index_min_results - len(all_results)])
 
         print(f"📊 Total sources used: {', '.join(sources_used) if sources_used else 'None'}")
         print(f"📈 Total results found: {len(all_results)}")
 
+        if fetched and self.result_index:
+            # Queued: written by the index's own thread, off the request path
+            self.result_index.add((asdict(r) for r in fetched), language)
+
         return {
             'query': query,
             'language': language,
             'results': all_results[:10],
             'sources_used': sources_used,
             'total_found': len(all_results),
+            'offline': bool(all_results) and not fetched,
             'timestamp': datetime.now().isoformat()
         }
+
+    def _index_lookup(self, query: str, language: str, limit: int) -> List[SearchResult]:
+        if not self.result_index or limit <= 0:
+            return []
+        return [
+            SearchResult(hit['title'], hit['url'], hit['snippet'], LOCAL_INDEX_LABEL, hit['score'])
+            for hit in self.result_index.search(query, limit=limit, language=language)
+        ]
     
     def format_response(self, search_data: Dict) -> str:
         """Format response in appropriate language"""
@@ -388,108 +886,70 @@ Como posso ajudá-lo hoje?""",
         """Format response in Portuguese"""
         if not results:
             return self.pt_responses['welcome']
-        
-        results_content = ""
-        for i, result in enumerate(results[:5], 1):
-            results_content += f"""
-**{i}. {result.title}**
-🔗 {result.url}
-📝 {result.snippet}
-🏷️ Fonte: {result.source}
-"""
-        
-        market_analysis = """
-• Preços atuais: R$ 40-250 por tCO2e (mercado voluntário)
-• Tendência: Alta demanda por projetos brasileiros
-• Regulamentação: Aguardando marco legal nacional
-• Oportunidades: REDD+, energia renovável, agricultura regenerativa
-"""
-        
-        recommendations = """
-• Verifique certificações (VCS, Gold Standard)
-• Considere co-benefícios socioambientais  
-• Avalie adicionalidade dos projetos
-• Monitore tendências regulatórias
-"""
-        
         return self.pt_responses['search_results'].format(
             query=query,
-            results_content=results_content,
-            market_analysis=market_analysis,
-            recommendations=recommendations
+            results_content=_results_markdown(results, "Fonte")
         )
     
     def _format_english_response(self, query: str, results: List[SearchResult]) -> str:
         """Format response in English"""
         if not results:
-            return """🌱 **Carbon Credits Intelligence Agent**
-
-Hello! I'm your AI assistant for carbon credits research and market intelligence.
-
-**🔍 I can help you with:**
-• Current market prices and trends
-• Project analysis and investment opportunities  
-• Standards and verification (VCS, Gold Standard)
-• Carbon offset calculations
-• Brazilian and global markets
-• Academic research and data
-
-**Try asking:**
-• "Current carbon credit prices in Brazil"
-• "Where to buy verified carbon credits"
-• "How to calculate corporate carbon offsets"
-
-How can I assist you today?"""
-        
-        results_content = ""
-        for i, result in enumerate(results[:5], 1):
-            results_content += f"""
-**{i}. {result.title}**
-🔗 {result.url}
-📝 {result.snippet}
-🏷️ Source: {result.source}
-"""
-        
+            return EN_WELCOME_RESPONSE
         return f"""🔍 **Search Results - {query}**
 
-{results_content}
+{_results_markdown(results, "Source")}
 
-**📊 Market Analysis:**
-• Current prices: $10-50 per tCO2e (voluntary market)
-• Trend: Growing demand for high-quality credits
-• Regulation: Evolving frameworks globally
-• Opportunities: Nature-based solutions, direct air capture
-
-**💡 Next Steps:**
-• Verify project certifications (VCS, Gold Standard)
-• Consider co-benefits and permanence
-• Evaluate additionality claims
-• Monitor regulatory developments"""
+{EN_ANALYSIS_BLOCK}"""
     
+    def search_stats(self) -> Dict:
+        """Runtime counters of the search subsystem, for diagnostics."""
+        with self._quorum_lock:
+            early_returns, harvested = self.quorum_early_returns, self.quorum_harvested
+        return {
+            'engine': self.async_engine.stats() if self.async_engine else self.search_executor.stats(),
+            'quorum': {
+                'min_results': self.quorum_results,
+                'min_providers': self.quorum_providers,
+                'early_returns': early_returns,
+                'harvested': harvested,
+            },
+            'breakers': {name: breaker.snapshot() for name, breaker in self.breakers.items()},
+            'quota': self.quota.snapshot() if self.quota else None,
+            'single_flight': self.single_flight.stats(),
+            'cache': self.search_cache.stats(),
+            'shared_cache': self.shared_cache.stats() if self.shared_cache else None,
+            'result_index': self.result_index.stats() if self.result_index else None,
+        }
+
+    def _breaker_note(self, name: str) -> str:
+        snapshot = self.breakers[name].snapshot()
+        labels = {CLOSED: '🟢 fechado', OPEN: '🔴 aberto'}
+        return f" | Circuito: {labels.get(snapshot['state'], '🟡 semiaberto')} (timeout {snapshot['timeout_seconds']}s)"
+
     def check_api_status(self, language: str = 'en') -> str:
         """Check status of all search APIs"""
         status_info = []
         
         # Google API
         if self.google_api_key and self.google_cse_id:
-            status_info.append("✅ Google Custom Search: Configurado")
+            status_info.append("✅ Google Custom Search: Configurado" + self._breaker_note('google'))
         else:
             status_info.append("❌ Google Custom Search: Chaves ausentes")
         
         # Tavily API  
         if self.tavily_api_key:
-            status_info.append("✅ Tavily AI: Configurado")
+            status_info.append("✅ Tavily AI: Configurado" + self._breaker_note('tavily'))
         else:
             status_info.append("❌ Tavily AI: Chave ausente")
         
         # Serper API
         if self.serper_api_key:
-            status_info.append("✅ Serper API: Configurado")
+            status_info.append("✅ Serper API: Configurado" + self._breaker_note('serper'))
         else:
             status_info.append("❌ Serper API: Chave ausente")
         
         # DuckDuckGo status
-        status_info.append("✅ DuckDuckGo: Disponível" if self.use_ddg else "⏸️ DuckDuckGo: Desativado")
+        status_info.append("✅ DuckDuckGo: Disponível" + self._breaker_note('duckduckgo') if self.use_ddg else "⏸️ DuckDuckGo: Desativado")
         
         if language == 'pt-BR':
             return self.pt_responses['api_status'].format(
@@ -506,6 +966,55 @@ How can I assist you today?"""
 3. **Serper API** - Real-time market data  
 4. **DuckDuckGo** - Backup for maximum availability"""
 
+EN_WELCOME_RESPONSE = """🌱 **Carbon Credits Intelligence Agent**
+
+Hello! I'm your AI assistant for carbon credits research and market intelligence.
+
+**🔍 I can help you with:**
+• Current market prices and trends
+• Project analysis and investment opportunities  
+• Standards and verification (VCS, Gold Standard)
+• Carbon offset calculations
+• Brazilian and global markets
+• Academic research and data
+
+**Try asking:**
+• "Current carbon credit prices in Brazil"
+• "Where to buy verified carbon credits"
+• "How to calculate corporate carbon offsets"
+
+How can I assist you today?"""
+
+EN_ANALYSIS_BLOCK = """**📊 Market Analysis:**
+• Current prices: $10-50 per tCO2e (voluntary market)
+• Trend: Growing demand for high-quality credits
+• Regulation: Evolving frameworks globally
+• Opportunities: Nature-based solutions, direct air capture
+
+**💡 Next Steps:**
+• Verify project certifications (VCS, Gold Standard)
+• Consider co-benefits and permanence
+• Evaluate additionality claims
+• Monitor regulatory developments"""
+
+
+def _results_markdown(results: List[SearchResult], source_label: str) -> str:
+    return "".join(
+        f"\n**{i}. {r.title}**\n🔗 {r.url}\n📝 {r.snippet}\n🏷️ {source_label}: {r.source}\n"
+        for i, r in enumerate(results[:5], 1)
+    )
+
+
+# Sample questions shown to users; also kept warm in the search cache
+SAMPLE_QUERIES = [
+    "Onde posso comprar créditos de carbono no Brasil?",
+    "Qual é o preço atual dos créditos de carbono?",
+    "Como funciona o mercado de carbono brasileiro?",
+    "Where can I buy carbon credits in Brazil?",
+    "What are the current carbon credit prices?",
+    "How does the Brazilian carbon market work?"
+]
+
 def main():
     """Main function for testing"""
     agent = BilingualCarbonAgent()
@@ -513,16 +1022,7 @@ def main():
     print("🌱 Enhanced Bilingual Carbon Credits Agent")
     print("=" * 50)
     
-    test_queries = [
-        "Onde posso comprar créditos de carbono no Brasil?",
-        "Qual é o preço atual dos créditos de carbono?",
-        "Como funciona o mercado de carbono brasileiro?",
-        "Where can I buy carbon credits in Brazil?",
-        "What are the current carbon credit prices?",
-        "How does the Brazilian carbon market work?"
-    ]
-    
-    for query in test_queries:
+    for query in SAMPLE_QUERIES:
         print(f"\n🔍 Query: {query}")
         print("-" * 40)
         
@@ -0,0 +1,84 @@
+"""
+📦 HTTP Response Optimizations
+==============================
+* Content-negotiated compression (brotli when available, else gzip) for
+  textual responses above ``COMPRESS_MIN_BYTES``. Streaming responses (SSE)
+  and already-encoded bodies are left alone.
+* ``conditional_json`` — JSON responses with a weak ETag so clients revalidate
+  with ``If-None-Match`` and unchanged data costs a 304.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Iterable
+
+from flask import Flask, Response, jsonify, request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "text/html", "text/plain", "text/css", "text/csv",
+    "application/javascript", "text/javascript", "image/svg+xml",
+}
+
+
+def _choose_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"] > 0:
+        return "br"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return ""
+
+
+def init_compression(app: Flask) -> None:
+    min_bytes = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+    gzip_level = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    brotli_quality = int(os.getenv("COMPRESS_BROTLI_QUALITY", 5))
+    if os.getenv("COMPRESS_ENABLED", "1") in ("0", "false", "False"):
+        return
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code in (204, 304) or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        encoding = _choose_encoding()
+        if not encoding:
+            return response
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=gzip_level)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        # Strong validators would now describe the uncompressed bytes; keep them weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def conditional_json(payload: Dict, volatile: Iterable[str] = ()) -> Response:
+    """JSON response with a weak ETag; answers 304 when ``If-None-Match`` matches.
+
+    Keys in ``volatile`` (e.g. a server timestamp) are left out of the hash so
+    they alone never invalidate the client's copy.
+    """
+    stable = {k: v for k, v in payload.items() if k not in set(volatile)}
+    digest = hashlib.sha1(json.dumps(stable, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    response = jsonify(payload)
+    response.set_etag(digest, weak=True)
+    # Private data: revalidate every time, never store in shared caches
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
@@ -0,0 +1,280 @@
+"""
+🚦 Load Test Harness
+====================
+Drives the real user flow — ``/api/register-trial`` → ``/validate_trial`` →
+``/search`` × N → ``/api/trial-status`` — with concurrent virtual users, against
+the app served by gunicorn with the production ``-k gthread`` settings and the
+search providers replaced by ``provider_standin``.
+
+Reports throughput, p50/p95/p99 latency and error rates per endpoint, then
+checks for every trial that ``queries_used`` equals the number of successful
+searches charged to it (lost or double updates show up as mismatches) and
+never exceeds ``queries_limit``. Exit code 1 when any check fails.
+
+Usage::
+
+    python loadtest.py --users 40 --trials 5 --searches 20 --workers 2 --threads 4
+    python loadtest.py --target http://127.0.0.1:3000 --users 10   # already running app
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from enhanced_bilingual_agent import SAMPLE_QUERIES
+from provider_standin import FaultProfile, StandInServer, parse_errors, parse_latency
+
+EXTRA_QUERIES = [
+    "Projetos REDD+ na Amazônia",
+    "Preço do crédito de carbono na B3",
+    "COP30 em Belém e o mercado de carbono",
+    "Gold Standard vs Verra certification",
+    "Carbon offset prices for aviation",
+    "Créditos de carbono no Cerrado",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Thread-safe latency/status samples per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[tuple]] = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool, status) -> None:
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((seconds, ok, status))
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        report = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = [s[0] * 1000 for s in samples]
+            errors = [s for s in samples if not s[1]]
+            statuses: Dict[str, int] = {}
+            for _, _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            report[endpoint] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "max_ms": round(max(latencies), 1),
+                "error_rate": round(len(errors) / len(samples), 4),
+                "statuses": statuses,
+            }
+        return report
+
+
+class LoadTest:
+    def __init__(self, base_url: str, users: int, trials: int, searches: int, think_time: float = 0.0,
+                 seed: int = 0, settle_seconds: float = 1.0):
+        self.base_url = base_url.rstrip("/")
+        self.users = users
+        self.trials = trials
+        self.searches = searches
+        self.think_time = think_time
+        self.settle_seconds = settle_seconds
+        self.recorder = Recorder()
+        self.charged: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.queries = SAMPLE_QUERIES + EXTRA_QUERIES
+
+    def _call(self, session: requests.Session, endpoint: str, payload: Dict) -> Optional[Dict]:
+        started = time.perf_counter()
+        status, body = "EXC", None
+        try:
+            response = session.post(f"{self.base_url}{endpoint}", json=payload, timeout=60)
+            status = response.status_code
+            body = response.json()
+        except Exception as e:
+            body = {"success": False, "message": str(e)}
+        ok = status == 200 and bool(body and body.get("success"))
+        self.recorder.add(endpoint, time.perf_counter() - started, ok, status)
+        return body if ok else None
+
+    def register(self, index: int, run_id: str) -> Optional[str]:
+        with requests.Session() as session:
+            body = self._call(session, "/api/register-trial", {
+                "fullName": f"Load User {index}",
+                "email": f"load-{run_id}-{index}@loadtest.local",
+                "company": "LoadCorp",
+            })
+        return body["trial_key"] if body else None
+
+    def user(self, index: int, trial_key: str) -> None:
+        rng = random.Random(index)
+        with requests.Session() as session:
+            self._call(session, "/validate_trial", {"trial_key": trial_key})
+            for _ in range(self.searches):
+                # Suffix keeps some queries unique so not everything is a cache hit
+                query = rng.choice(self.queries)
+                if rng.random() < 0.5:
+                    query = f"{query} {rng.randint(1, 1000)}"
+                if self._call(session, "/search", {"query": query, "trial_key": trial_key}):
+                    with self._lock:
+                        self.charged[trial_key] = self.charged.get(trial_key, 0) + 1
+                if self.think_time:
+                    time.sleep(rng.uniform(0, 2 * self.think_time))
+            self._call(session, "/api/trial-status", {"trial_key": trial_key})
+
+    def verify(self, keys: List[str]) -> List[Dict]:
+        """Compare server-side usage with what the clients were served."""
+        problems = []
+        with requests.Session() as session:
+            for key in keys:
+                response = session.post(f"{self.base_url}/api/trial-status", json={"trial_key": key}, timeout=30)
+                body = response.json()
+                used = body.get("queries_used")
+                limit = (used or 0) + (body.get("queries_remaining") or 0)
+                expected = self.charged.get(key, 0)
+                if used != expected or used > limit:
+                    problems.append({"trial_key": key, "queries_used": used, "successful_searches": expected,
+                                     "queries_limit": limit})
+        return problems
+
+    def run(self) -> Dict:
+        run_id = f"{int(time.time())}-{self._rng.randint(1000, 9999)}"
+        with ThreadPoolExecutor(max_workers=min(self.trials, 32)) as pool:
+            keys = [k for k in pool.map(lambda i: self.register(i, run_id), range(self.trials)) if k]
+        if not keys:
+            raise RuntimeError("No trial could be registered; is the app up?")
+        # Several users share each trial key: the contended case for the usage counter
+        assignments = [keys[i % len(keys)] for i in range(self.users)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.users) as pool:
+            list(pool.map(lambda pair: self.user(*pair), enumerate(assignments)))
+        elapsed = time.perf_counter() - started
+        # Let every worker's write-behind buffer reach the DB before comparing
+        time.sleep(self.settle_seconds)
+        problems = self.verify(keys)
+        total = sum(len(s) for s in self.recorder.samples.values())
+        return {
+            "config": {"users": self.users, "trials": len(keys), "searches_per_user": self.searches},
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": self.recorder.summary(elapsed),
+            "successful_searches": sum(self.charged.values()),
+            "usage_mismatches": problems,
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(port: int, workers: int, threads: int, env: Dict[str, str]) -> subprocess.Popen:
+    """Same command line as the Procfile, bound to localhost."""
+    command = [
+        sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+        "-b", f"127.0.0.1:{port}", "app:app", "--timeout", "120",
+    ]
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become healthy in 60s")
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n⏱️  {report['elapsed_seconds']}s, {report['throughput_rps']} req/s overall")
+    print(f"{'endpoint':<22}{'reqs':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<22}{stats['requests']:>7}{stats['throughput_rps']:>9}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['error_rate']:>9.2%}")
+    if report["usage_mismatches"]:
+        print(f"\n❌ queries_used mismatches on {len(report['usage_mismatches'])} trial(s):")
+        for item in report["usage_mismatches"]:
+            print(f"   {item}")
+    else:
+        print(f"\n✅ queries_used matches {report['successful_searches']} successful searches on every trial")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent end-to-end load test of the trial/search flow.")
+    parser.add_argument("--target", help="Base URL of a running app; default starts gunicorn + stand-in")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--trials", type=int, default=5, help="Trials registered (users share them)")
+    parser.add_argument("--searches", type=int, default=10, help="Searches per user")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between searches (s)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("GUNICORN_THREADS", 4)))
+    parser.add_argument("--latency", default="lognormal:0.3,0.5", help="Stand-in provider latency distribution")
+    parser.add_argument("--errors", default="429:0.01,503:0.02", help="Stand-in provider error mix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--settle", type=float, default=1.0,
+                        help="Wait before verifying usage (covers USAGE_FLUSH_INTERVAL_MS)")
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    standin = process = workdir = None
+    base_url = args.target
+    try:
+        if not base_url:
+            standin = StandInServer(faults=FaultProfile(
+                latency={"*": parse_latency(args.latency)}, errors={"*": parse_errors(args.errors)},
+                seed=args.seed)).start()
+            workdir = tempfile.mkdtemp(prefix="carbon-load-")
+            env = dict(os.environ,
+                       DB_PATH=os.path.join(workdir, "trials.db"),
+                       SEARCH_PROVIDER_BASE_URL=standin.base_url,
+                       GOOGLE_API_KEY="load", GOOGLE_CSE_ID="load", SERPER_API_KEY="load", TAVILY_API_KEY="load",
+                       SEARCH_USE_DDG="0", SEARCH_WARM_INTERVAL_SECONDS="0", SEARCH_QUOTA_ENABLED="0")
+            port = _free_port()
+            print(f"🚀 gunicorn -w {args.workers} -k gthread --threads {args.threads} on :{port}, "
+                  f"providers → {standin.base_url}")
+            process = start_gunicorn(port, args.workers, args.threads, env)
+            base_url = f"http://127.0.0.1:{port}"
+
+        report = LoadTest(base_url, args.users, args.trials, args.searches, args.think_time, args.seed,
+                          args.settle).run()
+        print_report(report)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return 1 if report["usage_mismatches"] else 0
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        if standin:
+            standin.stop()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+📝 Markdown Renderer
+====================
+Converts the agent's markdown subset (``**bold**`` and line breaks) to HTML in
+a single regex pass, escaping everything else so provider titles/snippets can
+never inject markup.
+
+Text is rendered per blank-line-separated block and each block is memoized, so
+the constant bilingual sections (welcome text, market analysis, next steps)
+are rendered once per process and reused by every answer.
+"""
+
+import html
+import re
+from functools import lru_cache
+from typing import Iterable
+
+# One alternation, tried left to right at each position: bold span, line break, HTML metacharacter
+_TOKENS = re.compile(r"\*\*([^\n]+?)\*\*|(\n)|([&<>\"'])")
+# Blank-line runs separate blocks; the capture group keeps them in the split output
+_BLOCKS = re.compile(r"(\n\n+)")
+
+
+def _replace(match: "re.Match") -> str:
+    bold, newline, char = match.groups()
+    if bold is not None:
+        return f"<strong>{html.escape(bold)}</strong>"
+    if newline is not None:
+        return "<br>"
+    return html.escape(char)
+
+
+@lru_cache(maxsize=512)
+def render_block(block: str) -> str:
+    return _TOKENS.sub(_replace, block)
+
+
+def render_markdown(text: str) -> str:
+    """HTML for ``text``; output matches rendering the whole string in one pass."""
+    return "".join(render_block(part) for part in _BLOCKS.split(text or ""))
+
+
+def prerender(blocks: Iterable[str]) -> None:
+    """Render constant text ahead of the first request so it is served from the memo."""
+    for text in blocks:
+        render_markdown(text)
@@ -0,0 +1,125 @@
+"""
+🎟️ Provider Quota Limiter
+=========================
+Token buckets (per-second rate) plus daily counters for each search provider,
+kept in a small SQLite file so every gunicorn worker on the node draws from
+the same budget.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+
+class ProviderQuota:
+    """Cross-process limiter: ``try_acquire`` spends one call from a provider's budget.
+
+    ``limits`` maps provider -> (rate_per_second, daily_limit); 0 means unlimited.
+    Storage errors fail open so a broken quota file never blocks searches.
+    """
+
+    def __init__(self, path: str, limits: Dict[str, Tuple[float, int]],
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.limits = limits
+        self._clock = clock
+        self._local = threading.local()
+        self.denied: Dict[str, int] = {}
+        self.errors = 0
+        self.enabled = True
+        try:
+            conn = self._connect()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS provider_buckets (
+                    provider TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    used_today INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.commit()
+        except Exception as e:
+            print(f"[QUOTA] Provider quota tracking disabled ({self.path}): {e}")
+            self.enabled = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so BEGIN IMMEDIATE below controls the transaction
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _today(self, now: float) -> str:
+        return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+    def try_acquire(self, provider: str) -> bool:
+        rate, daily_limit = self.limits.get(provider, (0, 0))
+        if not self.enabled or (rate <= 0 and daily_limit <= 0):
+            return True
+        burst = max(1.0, rate)
+        now = self._clock()
+        today = self._today(now)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated_at, day, used_today FROM provider_buckets WHERE provider = ?",
+                (provider,),
+            ).fetchone()
+            if row is None:
+                tokens, used_today = burst, 0
+            else:
+                tokens, updated_at, day, used_today = row
+                tokens = min(burst, tokens + max(0.0, now - updated_at) * rate) if rate > 0 else burst
+                if day != today:
+                    used_today = 0
+            allowed = (rate <= 0 or tokens >= 1.0) and (daily_limit <= 0 or used_today < daily_limit)
+            if allowed:
+                tokens -= 1.0 if rate > 0 else 0.0
+                used_today += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO provider_buckets (provider, tokens, updated_at, day, used_today) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (provider, tokens, now, today, used_today),
+            )
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            self.errors += 1
+            print(f"[QUOTA] Limiter error for {provider}, allowing call: {e}")
+            return True
+        if not allowed:
+            self.denied[provider] = self.denied.get(provider, 0) + 1
+        return allowed
+
+    def snapshot(self) -> Dict:
+        info = {'enabled': self.enabled, 'path': os.path.abspath(self.path), 'errors': self.errors, 'providers': {}}
+        rows = {}
+        if self.enabled:
+            try:
+                for provider, tokens, updated_at, day, used_today in self._connect().execute(
+                    "SELECT provider, tokens, updated_at, day, used_today FROM provider_buckets"
+                ):
+                    rows[provider] = (tokens, day, used_today)
+            except Exception as e:
+                info['error'] = str(e)
+        today = self._today(self._clock())
+        for provider, (rate, daily_limit) in self.limits.items():
+            tokens, day, used_today = rows.get(provider, (max(1.0, rate), today, 0))
+            info['providers'][provider] = {
+                'rate_per_second': rate,
+                'daily_limit': daily_limit,
+                'used_today': used_today if day == today else 0,
+                'tokens': round(tokens, 2),
+                'denied': self.denied.get(provider, 0),
+            }
+        return info
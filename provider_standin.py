@@ -0,0 +1,309 @@
+"""
+🧪 Provider Stand-in Server
+===========================
+Local HTTP server that impersonates Google Custom Search, Serper and Tavily so
+the search path can be exercised and measured without network access.
+
+Point the agent at it with ``SEARCH_PROVIDER_BASE_URL=http://127.0.0.1:8099``;
+each provider is then served under ``/<name><real path>`` (``/serper/search``...).
+
+* Replay: answers come from a recordings file (provider -> normalized query ->
+  status/body); unknown queries get a deterministic synthetic answer.
+* Record: ``--record`` forwards requests to the real APIs and saves what they
+  returned, so later runs replay production payloads.
+* Faults: per-provider latency distributions, HTTP errors (403, 429, 5xx) and
+  hanging requests (timeouts), all drawn from a seeded RNG.
+
+Usage::
+
+    python provider_standin.py --port 8099 --recordings recordings.json \\
+        --latency lognormal:0.35,0.5 --latency tavily=uniform:0.8,2.5 \\
+        --errors serper=429:0.05,503:0.02 --timeouts google=0.01
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from enhanced_bilingual_agent import PROVIDER_ENDPOINTS as UPSTREAM  # real endpoints, used when recording
+from search_cache import normalize_query
+
+
+def parse_latency(spec: str):
+    """Return a sampler ``rng -> seconds`` for ``fixed:S``, ``uniform:A,B``,
+    ``normal:MU,SIGMA`` or ``lognormal:MEDIAN,SIGMA``."""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def parse_errors(spec: str) -> Dict[int, float]:
+    """``"429:0.05,503:0.02"`` -> ``{429: 0.05, 503: 0.02}``."""
+    errors = {}
+    for part in spec.split(','):
+        if part:
+            status, _, rate = part.partition(':')
+            errors[int(status)] = float(rate)
+    return errors
+
+
+def _per_provider(values, parse) -> Dict[str, object]:
+    """Parse repeated ``[provider=]spec`` options; the bare form sets the default ``'*'``."""
+    parsed = {}
+    for value in values or []:
+        provider, sep, spec = value.partition('=')
+        if not sep:
+            provider, spec = '*', value
+        parsed[provider] = parse(spec)
+    return parsed
+
+
+class FaultProfile:
+    """Latency, error and timeout behaviour per provider (``'*'`` is the default)."""
+
+    def __init__(self, latency=None, errors=None, timeouts=None, hang_seconds: float = 30.0, seed: int = 0):
+        self.latency = latency or {}
+        self.errors = errors or {}
+        self.timeouts = timeouts or {}
+        self.hang_seconds = hang_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _get(self, table, provider, default):
+        return table.get(provider, table.get('*', default))
+
+    def draw(self, provider: str) -> Tuple[float, Optional[int], bool]:
+        """Return ``(delay_seconds, error_status_or_None, hang)`` for one request."""
+        with self._lock:
+            sampler = self._get(self.latency, provider, None)
+            delay = sampler(self._rng) if sampler else 0.0
+            if self._rng.random() < self._get(self.timeouts, provider, 0.0):
+                return delay, None, True
+            roll = self._rng.random()
+            for status, rate in sorted(self._get(self.errors, provider, {}).items()):
+                if roll < rate:
+                    return delay, status, False
+                roll -= rate
+            return delay, None, False
+
+
+def synthetic_body(provider: str, query: str, count: int = 5) -> Dict:
+    """Deterministic, parser-compatible answer for a query with no recording."""
+    digest = hashlib.sha1(f"{provider}|{normalize_query(query)}".encode('utf-8')).hexdigest()[:8]
+    items = [
+        {
+            'title': f"{query} — resultado {i + 1}",
+            'url': f"https://standin.local/{provider}/{digest}/{i + 1}",
+            'snippet': f"Stand-in {provider} result {i + 1} for '{query}': carbon credits, REDD+, B3, BVRio.",
+        }
+        for i in range(count)
+    ]
+    if provider == 'google':
+        return {'items': [{'title': r['title'], 'link': r['url'], 'snippet': r['snippet']} for r in items]}
+    if provider == 'serper':
+        return {'organic': [{'title': r['title'], 'link': r['url'], 'snippet': r['snippet']} for r in items]}
+    return {'results': [{'title': r['title'], 'url': r['url'], 'content': r['snippet']} for r in items]}
+
+
+class Recordings:
+    """Recorded provider answers, persisted as JSON: ``{provider: {normalized query: {status, body}}}``."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Dict]] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, provider: str, query: str) -> Optional[Dict]:
+        return self.entries.get(provider, {}).get(normalize_query(query))
+
+    def put(self, provider: str, query: str, status: int, body: Dict) -> None:
+        with self._lock:
+            self.entries.setdefault(provider, {})[normalize_query(query)] = {'status': status, 'body': body}
+            if self.path:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f, ensure_ascii=False, indent=1)
+                os.replace(tmp, self.path)
+
+
+def _query_of(provider: str, params: Dict, body: Dict) -> str:
+    if provider == 'google':
+        return (params.get('q') or [''])[0]
+    if provider == 'tavily':
+        return body.get('query', '')
+    return body.get('q', '')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ProviderStandIn/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        # Session warm-up probes the host root
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self._serve()
+
+    def do_POST(self):
+        self._serve()
+
+    def _serve(self):
+        standin = self.server.standin
+        parts = urlsplit(self.path)
+        provider = parts.path.strip('/').split('/', 1)[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if provider not in UPSTREAM:
+            return self._reply(404, {'error': f"unknown provider '{provider}'"})
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = {}
+        query = _query_of(provider, parse_qs(parts.query), body)
+
+        delay, error, hang = standin.faults.draw(provider)
+        standin.count(provider, 'requests')
+        if hang:
+            standin.count(provider, 'timeouts')
+            time.sleep(standin.faults.hang_seconds)
+            self.close_connection = True
+            return
+        if delay:
+            time.sleep(delay)
+        if error:
+            standin.count(provider, f"http_{error}")
+            return self._reply(error, {'error': f"injected HTTP {error}"})
+
+        if standin.record:
+            status, payload = standin.forward(provider, self.command, parts.query, raw, self.headers)
+            standin.recordings.put(provider, query, status, payload)
+            return self._reply(status, payload)
+        recorded = standin.recordings.get(provider, query)
+        if recorded:
+            standin.count(provider, 'replayed')
+            return self._reply(recorded.get('status', 200), recorded.get('body', {}))
+        standin.count(provider, 'synthetic')
+        return self._reply(200, synthetic_body(provider, query))
+
+    def _reply(self, status: int, payload: Dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer:
+    """Run the stand-in in a background thread (tests, benchmarks) or via ``serve_forever``."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, recordings: Optional[Recordings] = None,
+                 faults: Optional[FaultProfile] = None, record: bool = False):
+        self.recordings = recordings or Recordings()
+        self.faults = faults or FaultProfile()
+        self.record = record
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, provider: str, what: str) -> None:
+        with self._lock:
+            bucket = self.counters.setdefault(provider, {})
+            bucket[what] = bucket.get(what, 0) + 1
+
+    def forward(self, provider: str, method: str, query_string: str, raw: bytes, headers) -> Tuple[int, Dict]:
+        import requests  # only needed when recording
+
+        url = UPSTREAM[provider] + (f"?{query_string}" if query_string else '')
+        keep = {k: v for k, v in headers.items() if k.lower() in ('authorization', 'x-api-key', 'content-type')}
+        response = requests.request(method, url, data=raw or None, headers=keep, timeout=15)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {'error': response.text[:500]}
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='provider-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the search provider APIs.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--recordings', help="JSON file to replay from (and write to with --record)")
+    parser.add_argument('--record', action='store_true', help="Forward to the real APIs and save the answers")
+    parser.add_argument('--latency', action='append', metavar='[PROVIDER=]DIST',
+                        help="fixed:S | uniform:A,B | normal:MU,SIGMA | lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--errors', action='append', metavar='[PROVIDER=]STATUS:RATE,...')
+    parser.add_argument('--timeouts', action='append', metavar='[PROVIDER=]RATE',
+                        help="Share of requests that hang for --hang-seconds")
+    parser.add_argument('--hang-seconds', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    faults = FaultProfile(
+        latency=_per_provider(args.latency, parse_latency),
+        errors=_per_provider(args.errors, parse_errors),
+        timeouts=_per_provider(args.timeouts, float),
+        hang_seconds=args.hang_seconds,
+        seed=args.seed,
+    )
+    server = StandInServer(args.host, args.port, Recordings(args.recordings), faults, record=args.record)
+    print(f"🧪 Provider stand-in on {server.base_url} ({'recording' if args.record else 'replay'})")
+    print(f"   export SEARCH_PROVIDER_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Counters: {json.dumps(server.counters)}")
+
+
+if __name__ == '__main__':
+    main()
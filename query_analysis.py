@@ -0,0 +1,128 @@
+"""
+🧭 Query Analysis
+=================
+Analysis of a user query: language, location focus and the intent used to
+pick a static fallback answer. The query is folded once (lowercase, accents
+stripped) and every distinct term of all the lists is looked up in it with a
+plain substring test, one test per term; the result is memoized. This is not a
+single pass: a combined regex or automaton was measured and dropped because
+it was slower (see ``QueryAnalyzer``).
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, NamedTuple
+
+PORTUGUESE_KEYWORDS = [
+    'créditos', 'carbono', 'compensação', 'mercado', 'brasil', 'onde',
+    'como', 'posso', 'comprar', 'vender', 'preço', 'certificação',
+    'sustentabilidade', 'emissões', 'empresa', 'investimento',
+    'qual', 'quando', 'porque', 'quem', 'quanto', 'devo', 'preciso'
+]
+
+BRAZILIAN_ENTITIES = [
+    'brasil', 'brazil', 'bvrio', 'b3', 'petrobras', 'bndes',
+    'amazônia', 'amazon', 'cerrado', 'mata atlântica'
+]
+
+LOCATION_INDICATORS = [
+    'where', 'onde', 'in brazil', 'no brasil', 'brasil',
+    'são paulo', 'rio de janeiro', 'amazon', 'amazônia'
+]
+
+COP30_TERMS = ['cop30', 'cop 30', 'belém', 'belem']
+
+PRICE_TERMS = ['preço', 'precos', 'price', 'valor', 'custo']
+
+
+_COMBINING = re.compile('[\u0300-\u036f]')
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ("Preço" -> "preco")."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _COMBINING.sub('', unicodedata.normalize('NFKD', text))
+
+
+def _ascii_fold(text: str) -> str:
+    """``fold`` for matching ASCII terms: whatever has no ASCII form is dropped.
+
+    Decomposing and encoding both run in C, and substring search on an ASCII
+    string is much faster than on one with wider characters.
+    """
+    text = text.lower()
+    if text.isascii():
+        return text
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+class QueryAnalysis(NamedTuple):
+    # A NamedTuple rather than a frozen dataclass: equally immutable, several times cheaper to build
+    query: str
+    language: str
+    location_specific: bool
+    fallback_intent: str  # 'cop30', 'price' or 'default'
+    matched: FrozenSet[str]
+
+    @property
+    def language_name(self) -> str:
+        return "Portuguese (Brazilian)" if self.language == 'pt-BR' else "English (US)"
+
+
+class QueryAnalyzer:
+    """Finds which term categories occur anywhere in a text.
+
+    Keeps the substring semantics of the old ``term in query`` loops, but the
+    text is folded to ASCII once and each distinct term is tested once (the old
+    code re-lowered the query per indicator and tested shared terms in several
+    lists). ``in`` runs CPython's C substring search; a regex alternation over
+    the same terms steps through every position in the interpreter loop of
+    ``re`` and measured slower, especially on long queries.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        terms: Dict[str, set] = {}
+        for category, words in categories.items():
+            for word in words:
+                terms.setdefault(fold(word), set()).add(category)
+        if not all(term.isascii() for term in terms):
+            raise ValueError("QueryAnalyzer terms must fold to ASCII")
+        self._terms = tuple((term, frozenset(cats)) for term, cats in terms.items())
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        text = _ascii_fold(text)
+        return frozenset().union(*[categories for term, categories in self._terms if term in text])
+
+
+_ANALYZER = QueryAnalyzer({
+    'portuguese': PORTUGUESE_KEYWORDS,
+    'brazilian_entity': BRAZILIAN_ENTITIES,
+    'location': LOCATION_INDICATORS,
+    'cop30': COP30_TERMS,
+    'price': PRICE_TERMS,
+})
+
+
+_PORTUGUESE_SIGNALS = frozenset({'portuguese', 'brazilian_entity'})
+
+
+@lru_cache(maxsize=2048)
+def analyze_query(query: str) -> QueryAnalysis:
+    """Analyze ``query`` once; repeated calls for the same text hit the memo."""
+    matched = _ANALYZER.scan(query or '')
+    if 'cop30' in matched:
+        intent = 'cop30'
+    elif 'price' in matched:
+        intent = 'price'
+    else:
+        intent = 'default'
+    return QueryAnalysis(
+        query,
+        'en' if _PORTUGUESE_SIGNALS.isdisjoint(matched) else 'pt-BR',
+        'location' in matched,
+        intent,
+        matched,
+    )
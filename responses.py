@@ -1,29 +1,71 @@
 # responses.py
 
+import hashlib
+import json
+import os
+from html import escape
+
+from markdown_render import render_markdown
+from query_analysis import analyze_query
+from search_cache import SearchCache
+
+# Cache de HTML pronto, indexado pelo hash do payload da busca (RENDER_CACHE_TTL_SECONDS=0 desativa)
+_render_cache = SearchCache(
+    max_entries=int(os.getenv("RENDER_CACHE_MAX_ENTRIES", 512)),
+    ttl_seconds=float(os.getenv("RENDER_CACHE_TTL_SECONDS", 3600)),
+    stale_seconds=0,
+)
+
+
+def _payload_digest(query, language_name, search_data, location_specific):
+    """Hash de tudo que influencia o HTML final de uma resposta."""
+    material = json.dumps([
+        query, language_name, location_specific, search_data.get('language'), search_data.get('total_found'),
+        [[r.title, r.url, r.snippet, r.source] for r in search_data.get('results', [])],
+    ], ensure_ascii=False)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def render_agent_answer(query, search_data, language_name, location_specific, format_response):
+    """HTML da resposta do agente, reaproveitado do cache quando o payload já foi formatado."""
+    key = _payload_digest(query, language_name, search_data, location_specific)
+    cached, _ = _render_cache.get(key)
+    if cached is not None:
+        return cached['html']
+    html = format_agent_html(query, format_response(search_data), language_name, search_data, location_specific)
+    _render_cache.set(key, {'html': html})
+    return html
+
+
+def render_cache_stats():
+    return _render_cache.stats()
+
+
 def format_agent_html(query, agent_response, language_name, search_data, location_specific):
     """Formata a resposta do agente em HTML"""
+    sources = ', '.join(escape(r.source) for r in search_data['results'][:3])
     formatted = f"""
-    <h4 style="color: #6b46c1;">🎯 Análise Inteligente: {query}</h4>
+    <h4 style="color: #6b46c1;">🎯 Análise Inteligente: {escape(query)}</h4>
     <div style="background: #f0f9ff; padding: 12px; border-radius: 8px; border-left: 4px solid #0ea5e9;">
         <h5 style="color: #0369a1;">🌐 Pesquisa Realizada:</h5>
-        <p style="font-size: 13px;"><strong>Idioma:</strong> {language_name} | <strong>Fontes:</strong> {search_data['total_found']} | <strong>Estratégia:</strong> {'Local (Brasil)' if location_specific else 'Global'}</p>
+        <p style="font-size: 13px;"><strong>Idioma:</strong> {escape(language_name)} | <strong>Fontes:</strong> {search_data['total_found']} | <strong>Estratégia:</strong> {'Local (Brasil)' if location_specific else 'Global'}</p>
     </div>
     <div style="background: white; padding: 15px; border-radius: 8px; border: 1px solid #e5e7eb;">
-        {agent_response.replace(chr(10), '<br>').replace('**', '<strong>').replace('**', '</strong>')}
+        {render_markdown(agent_response)}
     </div>
     <div style="background: #e8f5e8; padding: 15px; border-radius: 8px; border-left: 4px solid #4CAF50;">
         <h5 style="color: #059669;">💡 Fontes Consultadas:</h5>
-        <p style="font-size: 13px;"><strong>APIs:</strong> {', '.join([r.source for r in search_data['results'][:3]])} | <strong>Atualização:</strong> Dados em tempo real</p>
+        <p style="font-size: 13px;"><strong>APIs:</strong> {sources} | <strong>Atualização:</strong> Dados em tempo real</p>
     </div>
     """
     return formatted
 
-def generate_fallback_response(query):
+def generate_fallback_response(query, analysis=None):
     """Gera resposta estática inteligente"""
-    query_lower = query.lower()
-    if any(term in query_lower for term in ['cop30', 'cop 30', 'belém', 'belem']):
+    intent = (analysis or analyze_query(query)).fallback_intent
+    if intent == 'cop30':
         return generate_cop30_response(query)
-    elif any(term in query_lower for term in ['preço', 'precos', 'price', 'valor', 'custo']):
+    elif intent == 'price':
         return generate_price_response(query)
     else:
         return generate_default_response(query)
@@ -33,7 +75,7 @@ def generate_default_response(query):
     <h4 style="color: #059669;">Informação sobre Créditos de Carbono</h4>
     <div style="background: #f0f9ff; padding: 15px; border-radius: 8px; border-left: 4px solid #0ea5e9;">
         <p>
-            Não encontramos uma resposta específica para sua consulta: <strong>{query}</strong>.<br>
+            Não encontramos uma resposta específica para sua consulta: <strong>{escape(query)}</strong>.<br>
             Por favor, refine sua pergunta ou tente termos relacionados a créditos de carbono, COP30, preços ou regulamentações.
         </p>
         <p>
@@ -0,0 +1,246 @@
+"""
+📚 Local Result Index
+=====================
+Every provider result we fetch (title, url, snippet, source) is kept in a
+SQLite table with an FTS5 index, shared by all gunicorn workers. ``search`` ranks stored
+results with BM25, so the agent can answer from disk when providers are down,
+over quota or too slow, and top up sparse provider answers.
+"""
+
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+from query_analysis import fold
+
+# Tokens shorter than this are mostly stopwords ("de", "no", "in") and only add noise
+MIN_TOKEN_LENGTH = 3
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query: str, max_terms: int = 12) -> str:
+    """FTS5 MATCH string ORing the query's distinct folded tokens, or '' if none."""
+    terms = []
+    for token in _TOKEN_RE.findall(fold(query or "")):
+        if len(token) >= MIN_TOKEN_LENGTH and token not in terms:
+            terms.append(token)
+    return " OR ".join(f'"{term}"' for term in terms[:max_terms])
+
+
+class ResultIndex:
+    """Persistent BM25-ranked store of search results, keyed by URL.
+
+    Rows live in a regular ``results`` table (``url`` is its unique key, so
+    upserts are index lookups); ``results_fts`` is an external-content FTS5
+    index over it, kept in sync by triggers. A re-fetched URL is replaced with
+    a new rowid, so rowid order is recency order. ``add`` only queues the rows:
+    a background thread writes them, so indexing never runs on the request path.
+
+    Storage errors are counted and logged; a broken index file never breaks
+    a search.
+    """
+
+    def __init__(self, path: str, max_rows: int = 20000, clock: Callable[[], float] = time.time,
+                 queue_max: int = 256, rank_candidates: int = 2000):
+        self.path = path
+        self.max_rows = int(max_rows)
+        self.rank_candidates = max(1, int(rank_candidates))
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_max)))
+        self._writer = None
+        self._writes = 0
+        self.indexed = 0
+        self.dropped = 0
+        self.lookups = 0
+        self.matches = 0
+        self.errors = 0
+        self.enabled = True
+        try:
+            conn = self._connect()
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,
+                    title TEXT, snippet TEXT, source TEXT, language TEXT,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+                    title, snippet, content = 'results', content_rowid = 'id',
+                    tokenize = 'unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS results_ai AFTER INSERT ON results BEGIN
+                    INSERT INTO results_fts (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+                END;
+                CREATE TRIGGER IF NOT EXISTS results_ad AFTER DELETE ON results BEGIN
+                    INSERT INTO results_fts (results_fts, rowid, title, snippet)
+                    VALUES ('delete', old.id, old.title, old.snippet);
+                END;
+                CREATE TRIGGER IF NOT EXISTS results_au AFTER UPDATE ON results BEGIN
+                    INSERT INTO results_fts (results_fts, rowid, title, snippet)
+                    VALUES ('delete', old.id, old.title, old.snippet);
+                    INSERT INTO results_fts (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+                END;
+            """)
+            conn.commit()
+        except Exception as e:
+            print(f"[INDEX] Local result index disabled ({self.path}): {e}")
+            self.enabled = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # REPLACE must fire the delete trigger so the FTS index drops the old row
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+        return conn
+
+    def add(self, results: Iterable[Dict], language: str) -> int:
+        """Queue ``results`` (dicts with title/url/snippet/source) for indexing; returns rows queued.
+
+        When the writer falls behind and the queue is full the rows are dropped
+        (counted in ``dropped``): the index is a best-effort cache.
+        """
+        rows = [r for r in results if r.get("url") and (r.get("title") or r.get("snippet"))]
+        if not self.enabled or not rows:
+            return 0
+        try:
+            self._queue.put_nowait((rows, language, self._clock()))
+        except queue.Full:
+            self.dropped += len(rows)
+            return 0
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name='result-index-writer',
+                                                    daemon=True)
+                    self._writer.start()
+        return len(rows)
+
+    def flush(self) -> None:
+        """Block until every queued batch has been written."""
+        self._queue.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            batches = [self._queue.get()]
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batches)
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
+
+    def write(self, batches: List[tuple]) -> int:
+        """Upsert ``[(rows, language, fetched_at), ...]`` in one transaction."""
+        params = [
+            (r["url"], r.get("title", ""), r.get("snippet", ""), r.get("source", ""), language, fetched_at)
+            for rows, language, fetched_at in batches for r in rows
+        ]
+        try:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (url, title, snippet, source, language, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                params,
+            )
+            conn.commit()
+        except Exception as e:
+            self.errors += 1
+            print(f"[INDEX] Write failed: {e}")
+            return 0
+        self.indexed += len(params)
+        self._writes += len(batches)
+        if self._writes >= 100:
+            self._writes = 0
+            self.trim()
+        return len(params)
+
+    def search(self, query: str, limit: int = 5, language: str = None) -> List[Dict]:
+        """Best matches for ``query`` by BM25 (title weighted above snippet).
+
+        Only the ``rank_candidates`` most recent matches are scored: common
+        terms match most of the table and bm25() costs per matching row. The
+        top ``3 * limit`` are fetched, then those in ``language`` move ahead of
+        the others; ``score`` is in (0, 1].
+        """
+        expression = match_expression(query)
+        if not self.enabled or not expression or limit <= 0:
+            return []
+        self.lookups += 1
+        try:
+            conn = self._connect()
+            # Walking the doclist newest-first is cheap; the rowid floor bounds the bm25() work
+            floor = conn.execute(
+                "SELECT rowid FROM results_fts WHERE results_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                (expression, self.rank_candidates - 1),
+            ).fetchone()
+            rows = conn.execute("""
+                SELECT r.title, r.snippet, r.url, r.source, r.language, m.rank
+                FROM (SELECT rowid, bm25(results_fts, 5.0, 1.0) AS rank FROM results_fts
+                      WHERE results_fts MATCH ? AND rowid >= ? ORDER BY rank LIMIT ?) AS m
+                JOIN results AS r ON r.id = m.rowid
+                ORDER BY m.rank
+            """, (expression, floor[0] if floor else 0, limit * 3)).fetchall()
+        except Exception as e:
+            self.errors += 1
+            print(f"[INDEX] Lookup failed: {e}")
+            return []
+        # Stable sort: BM25 order is kept within each language group
+        rows.sort(key=lambda row: row[4] != language)
+        rows = rows[:limit]
+        self.matches += len(rows)
+        # bm25() is negative, lower is better; map it onto (0, 1] for SearchResult.score
+        return [
+            {"title": title, "snippet": snippet, "url": url, "source": source, "score": round(-rank / (1 - rank), 4)}
+            for title, snippet, url, source, _, rank in rows
+        ]
+
+    def trim(self) -> int:
+        """Keep only the ``max_rows`` most recently fetched results."""
+        if not self.enabled:
+            return 0
+        try:
+            conn = self._connect()
+            removed = conn.execute(
+                "DELETE FROM results WHERE id IN (SELECT id FROM results ORDER BY id DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            ).rowcount
+            conn.commit()
+            return removed
+        except Exception as e:
+            self.errors += 1
+            print(f"[INDEX] Trim failed: {e}")
+            return 0
+
+    def stats(self) -> Dict:
+        info = {
+            "enabled": self.enabled,
+            "path": os.path.abspath(self.path),
+            "max_rows": self.max_rows,
+            "rank_candidates": self.rank_candidates,
+            "indexed": self.indexed,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "errors": self.errors,
+        }
+        if self.enabled:
+            try:
+                info["rows"] = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            except Exception as e:
+                info["error"] = str(e)
+        return info
@@ -0,0 +1,319 @@
+"""
+🗄️ Search Result Cache
+======================
+Caches for ``BilingualCarbonAgent.comprehensive_search`` payloads, keyed on the
+normalized query plus the detected language:
+
+* ``SearchCache`` — bounded in-process TTL/LRU tier (per gunicorn worker).
+* ``PersistentSearchCache`` — SQLite tier shared by every worker on the node
+  and kept across restarts.
+
+``SingleFlight`` coalesces concurrent misses for the same key into one search.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key."""
+    return " ".join((query or "").lower().split())
+
+
+def make_cache_key(query: str, language: str) -> str:
+    return f"{language}|{normalize_query(query)}"
+
+
+class SearchCache:
+    """Thread-safe TTL/LRU cache with stale-while-revalidate.
+
+    Entries younger than ``ttl_seconds`` are fresh. Entries older than that but
+    within ``stale_seconds`` past expiry are still served (flagged as stale) so
+    the caller can refresh them in the background. Anything older is a miss.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0,
+                 stale_seconds: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.stale_seconds = max(0.0, float(stale_seconds))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: str) -> Tuple[Optional[Dict], bool]:
+        """Return ``(payload, is_stale)``; payload is None on a miss."""
+        if not self.enabled:
+            return None, False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            stored_at, payload = entry
+            age = self._clock() - stored_at
+            if age <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload, False
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return payload, True
+            del self._entries[key]
+            self.misses += 1
+            return None, False
+
+    def set(self, key: str, payload: Dict, age: float = 0.0) -> None:
+        """Store ``payload``; ``age`` backdates entries copied from an older tier."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() - age, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since ``key`` was stored, or None if absent (does not touch stats/LRU)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else self._clock() - entry[0]
+
+    def begin_refresh(self, key: str) -> bool:
+        """Claim the background refresh for ``key``; False if one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: str) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshing": len(self._refreshing),
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """Return ``(result, shared)``; ``shared`` is True when another caller did the work.
+
+        Exceptions raised by the leader are re-raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result(timeout=timeout), True
+        try:
+            result = fn()
+            call.set_result(result)
+            return result, False
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+class PersistentSearchCache:
+    """SQLite-backed cache shared by all worker processes.
+
+    Payloads are stored as zlib-compressed JSON in a separate WAL-mode database
+    so readers never block on the trials DB. Expired rows and rows beyond the
+    size cap (oldest first) are purged periodically by whichever worker writes.
+    """
+
+    PURGE_EVERY_WRITES = 50
+
+    def __init__(self, path: str, ttl_seconds: float = 600.0, stale_seconds: float = 3600.0,
+                 max_bytes: int = 50 * 1024 * 1024, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.stale_seconds = max(0.0, float(stale_seconds))
+        self.max_bytes = int(max_bytes)
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.purged = 0
+        self.enabled = self.ttl_seconds > 0
+        if self.enabled:
+            try:
+                conn = self._connect()
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        key TEXT PRIMARY KEY,
+                        payload BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        stored_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_stored_at ON search_cache(stored_at)")
+                conn.commit()
+            except Exception as e:
+                print(f"[CACHE] Shared search cache disabled ({self.path}): {e}")
+                self.enabled = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        """Return ``(payload, age_seconds)`` for a servable entry, else None."""
+        if not self.enabled:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT payload, stored_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except Exception as e:
+            self.errors += 1
+            print(f"[CACHE] Shared cache read failed: {e}")
+            return None
+        if row is not None:
+            age = self._clock() - row[1]
+            if age <= self.ttl_seconds + self.stale_seconds:
+                try:
+                    payload = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+                    self.hits += 1
+                    return payload, max(0.0, age)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[CACHE] Corrupt shared cache entry dropped: {e}")
+        self.misses += 1
+        return None
+
+    def set(self, key: str, payload: Dict) -> None:
+        if not self.enabled:
+            return
+        try:
+            blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, payload, size, stored_at) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), self._clock()),
+            )
+            conn.commit()
+        except Exception as e:
+            self.errors += 1
+            print(f"[CACHE] Shared cache write failed: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.PURGE_EVERY_WRITES == 0
+        if due:
+            self.purge()
+
+    def purge(self) -> int:
+        """Drop expired rows, then the oldest rows until under ``max_bytes``."""
+        if not self.enabled:
+            return 0
+        try:
+            conn = self._connect()
+            cutoff = self._clock() - (self.ttl_seconds + self.stale_seconds)
+            removed = conn.execute("DELETE FROM search_cache WHERE stored_at < ?", (cutoff,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                rows = conn.execute("SELECT key, size FROM search_cache ORDER BY stored_at").fetchall()
+                victims = []
+                for row_key, size in rows:
+                    if excess <= 0:
+                        break
+                    victims.append((row_key,))
+                    excess -= size
+                conn.executemany("DELETE FROM search_cache WHERE key = ?", victims)
+                removed += len(victims)
+            conn.commit()
+            self.purged += removed
+            return removed
+        except Exception as e:
+            self.errors += 1
+            print(f"[CACHE] Shared cache purge failed: {e}")
+            return 0
+
+    def stats(self) -> Dict:
+        info = {
+            "enabled": self.enabled,
+            "path": os.path.abspath(self.path),
+            "ttl_seconds": self.ttl_seconds,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "purged": self.purged,
+        }
+        if self.enabled:
+            try:
+                count, size = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache"
+                ).fetchone()
+                info.update(entries=count, size_bytes=size)
+            except Exception as e:
+                info["error"] = str(e)
+        return info
@@ -0,0 +1,113 @@
+"""
+🧵 Shared Search Executor
+=========================
+One bounded thread pool per worker for provider calls, with admission control.
+
+``requests`` calls cannot be interrupted, so a timed-out provider thread keeps
+running after the response is sent. Counting those threads against a fixed
+budget (workers + queue) turns overload into fast rejections instead of an
+ever-growing pile of threads.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+
+class SearchSaturated(Exception):
+    """The shared executor has no room for more provider calls."""
+
+
+class ProviderSaturated(SearchSaturated):
+    """One provider already has its maximum number of calls in flight."""
+
+
+class BoundedSearchExecutor:
+    """ThreadPoolExecutor with a queue-depth limit and per-provider concurrency caps.
+
+    Calls submitted with ``batch=True`` run in a lower-priority lane: they may
+    only take ``batch_share`` of the total budget and of each provider's cap, so
+    a large batch can never lock interactive searches out of a provider.
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 32, per_provider: int = 8,
+                 batch_share: float = 0.5):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.per_provider = max(1, int(per_provider))
+        share = min(1.0, max(0.0, float(batch_share)))
+        self.batch_capacity = max(1, int(self.capacity * share))
+        self.batch_per_provider = max(1, int(self.per_provider * share))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='search')
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._by_provider: Dict[str, int] = {}
+        self._batch_admitted = 0
+        self._batch_by_provider: Dict[str, int] = {}
+        self.rejected = 0
+        self.provider_rejected: Dict[str, int] = {}
+        self.batch_rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def saturated(self) -> bool:
+        with self._lock:
+            return self._admitted >= self.capacity
+
+    def submit(self, provider: str, fn: Callable, *args, batch: bool = False) -> Future:
+        """Schedule ``fn`` for ``provider`` or raise without queueing anything."""
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected += 1
+                raise SearchSaturated(f"search executor saturated ({self._admitted}/{self.capacity})")
+            if self._by_provider.get(provider, 0) >= self.per_provider:
+                self.provider_rejected[provider] = self.provider_rejected.get(provider, 0) + 1
+                raise ProviderSaturated(f"{provider} has {self.per_provider} calls in flight")
+            if batch:
+                if self._batch_admitted >= self.batch_capacity:
+                    self.batch_rejected += 1
+                    raise SearchSaturated(f"batch lane saturated ({self._batch_admitted}/{self.batch_capacity})")
+                if self._batch_by_provider.get(provider, 0) >= self.batch_per_provider:
+                    self.batch_rejected += 1
+                    raise ProviderSaturated(f"{provider} has {self.batch_per_provider} batch calls in flight")
+                self._batch_admitted += 1
+                self._batch_by_provider[provider] = self._batch_by_provider.get(provider, 0) + 1
+            self._admitted += 1
+            self._by_provider[provider] = self._by_provider.get(provider, 0) + 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(provider, batch)
+            raise
+        future.add_done_callback(lambda _: self._release(provider, batch))
+        return future
+
+    def _release(self, provider: str, batch: bool = False) -> None:
+        with self._lock:
+            self._admitted -= 1
+            self._by_provider[provider] -= 1
+            if batch:
+                self._batch_admitted -= 1
+                self._batch_by_provider[provider] -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'type': 'threads',
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'per_provider': self.per_provider,
+                'admitted': self._admitted,
+                'saturated': self._admitted >= self.capacity,
+                'utilization': round(self._admitted / self.capacity, 4),
+                'in_flight_by_provider': dict(self._by_provider),
+                'rejected': self.rejected,
+                'provider_rejected': dict(self.provider_rejected),
+                'batch_capacity': self.batch_capacity,
+                'batch_per_provider': self.batch_per_provider,
+                'batch_admitted': self._batch_admitted,
+                'batch_rejected': self.batch_rejected,
+            }
@@ -0,0 +1,83 @@
+"""
+🗂️ Static Pipeline
+==================
+* Fingerprinting: ``url_for('static', ...)`` gets ``?v=<content hash>``; a
+  request carrying the current hash is served with a one-year ``immutable``
+  Cache-Control, anything else must revalidate.
+* Pre-rendered pages: templates that need no request context are rendered
+  once at boot and served from memory with an ETag (304 on revalidation).
+"""
+
+import hashlib
+import os
+from typing import Dict, Iterable
+
+from flask import Flask, Response, render_template, request
+
+FAR_FUTURE = "public, max-age=31536000, immutable"
+
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def build_manifest(static_folder: str) -> Dict[str, str]:
+    """Relative path (``/`` separated) -> content hash for every file under ``static_folder``."""
+    manifest = {}
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                manifest[os.path.relpath(path, static_folder).replace(os.sep, "/")] = _fingerprint(f.read())
+    return manifest
+
+
+def init_static_assets(app: Flask) -> Dict[str, str]:
+    manifest = build_manifest(app.static_folder) if app.static_folder and os.path.isdir(app.static_folder) else {}
+
+    @app.url_defaults
+    def add_asset_version(endpoint, values):
+        if endpoint == "static" and "v" not in values:
+            version = manifest.get(values.get("filename", ""))
+            if version:
+                values["v"] = version
+
+    @app.after_request
+    def cache_static_assets(response: Response) -> Response:
+        if request.endpoint == "static" and response.status_code in (200, 304):
+            current = manifest.get(request.view_args.get("filename", ""))
+            if current and request.args.get("v") == current:
+                response.headers["Cache-Control"] = FAR_FUTURE
+            else:
+                response.headers["Cache-Control"] = "public, no-cache"
+        return response
+
+    app.extensions["static_manifest"] = manifest
+    return manifest
+
+
+class PrerenderedPages:
+    """Templates rendered once; ``serve(name)`` answers from memory with a weak ETag.
+
+    With ``enabled=False`` (development) every call renders the template again so
+    edits show up without a restart.
+    """
+
+    def __init__(self, app: Flask, templates: Iterable[str], enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+        self.pages: Dict[str, tuple] = {}
+        if enabled:
+            with app.test_request_context("/"):
+                for name in templates:
+                    html = render_template(name).encode("utf-8")
+                    self.pages[name] = (html, _fingerprint(html))
+
+    def serve(self, name: str) -> Response:
+        if name not in self.pages:
+            return Response(render_template(name), mimetype="text/html")
+        html, etag = self.pages[name]
+        response = Response(html, mimetype="text/html")
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "public, no-cache"
+        return response.make_conditional(request)
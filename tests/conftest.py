@@ -0,0 +1,42 @@
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+# Keep test runs off the real trials.db / cache files and away from the network
+_tmp_dir = tempfile.mkdtemp(prefix="carbon-tests-")
+os.environ.setdefault("DB_PATH", os.path.join(_tmp_dir, "trials.db"))
+os.environ.setdefault("SEARCH_USE_DDG", "0")
+os.environ.setdefault("SEARCH_WARM_SESSIONS", "0")
+os.environ.setdefault("SEARCH_WARM_INTERVAL_SECONDS", "0")
+for _key in ("GOOGLE_API_KEY", "GOOGLE_CSE_ID", "SERPER_API_KEY", "TAVILY_API_KEY"):
+    os.environ.pop(_key, None)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def trials_schema():
+    """Create the trials tables even when a db-only test module runs on its own."""
+    import db
+    db.init_db()
+    db.upgrade_db()
+
+
+@pytest.fixture
+def new_trial():
+    """Factory for a fresh active trial with its own key, so tests never share quota state."""
+    import db
+
+    def create(queries_limit=100, days=14):
+        now = datetime.now()
+        key = f"CARBON-{uuid.uuid4().hex[:12].upper()}"
+        db.save_trial_to_db({
+            "email": f"{key.lower()}@tests.local", "trial_key": key, "full_name": "Test", "company": "TestCorp",
+            "role": "Analyst", "country": "Brasil", "start_date": now.isoformat(),
+            "end_date": (now + timedelta(days=days)).isoformat(), "queries_used": 0, "queries_limit": queries_limit,
+            "registration_date": now.isoformat(), "status": "active",
+        })
+        return key
+
+    return create
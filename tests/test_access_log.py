@@ -0,0 +1,48 @@
+import os
+
+from access_log import AccessLogWriter
+
+
+def test_records_are_written_in_batches():
+    batches = []
+    writer = AccessLogWriter(batches.append, batch_size=3)
+    for i in range(7):
+        writer.record("CARBON-X", f"query {i}", "10.0.0.1", 12, ["Serper API", "Tavily AI"], cache_hit=i % 2)
+    assert writer.drain() == 7
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    trial_key, query, _timestamp, ip_address, latency_ms, sources, cache_hit = batches[0][1]
+    assert (trial_key, query, ip_address, latency_ms) == ("CARBON-X", "query 1", "10.0.0.1", 12)
+    assert (sources, cache_hit) == ("Serper API,Tavily AI", 1)
+
+
+def test_overflow_is_dropped_or_spilled_and_replayed(tmp_path):
+    dropping = AccessLogWriter(lambda rows: None, max_queue=2)
+    for i in range(5):
+        dropping.record("CARBON-X", f"q{i}", None, 1)
+    assert dropping.stats()["dropped"] == 3
+
+    written = []
+    spill = str(tmp_path / "access_log.spill")
+    spilling = AccessLogWriter(written.extend, max_queue=2, spill_path=spill)
+    for i in range(5):
+        spilling.record("CARBON-X", f"q{i}", None, 1)
+    own_file = f"{spill}.{os.getpid()}"
+    assert spilling.stats()["spilled"] == 3 and os.path.exists(own_file)
+    spilling.drain()
+    spilling._replay_spill()
+    assert sorted(row[1] for row in written) == [f"q{i}" for i in range(5)]
+    assert os.listdir(tmp_path) == []
+
+
+def test_orphaned_spill_files_are_replayed_exactly_once(tmp_path):
+    spill = str(tmp_path / "access_log.spill")
+    dead_pid = 2 ** 22 + 1  # above the default pid_max, never a live process
+    with open(f"{spill}.{dead_pid}", "w", encoding="utf-8") as f:
+        f.writelines(f'["CARBON-X", "orphan {i}", "2026-01-01 00:00:00", null, 1, "", 0]\n' for i in range(3))
+
+    first, second = [], []
+    AccessLogWriter(first.extend, spill_path=spill)._replay_spill()
+    AccessLogWriter(second.extend, spill_path=spill)._replay_spill()
+    assert [row[1] for row in first] == ["orphan 0", "orphan 1", "orphan 2"]
+    assert second == []
+    assert os.listdir(tmp_path) == []
@@ -17,3 +17,153 @@ def test_generate_trial_key():
     assert isinstance(key, str)
     assert len(key) > 0
 
+
+def test_search_stream_emits_events_in_order(client, monkeypatch):
+    from app import carbon_agent
+    from enhanced_bilingual_agent import SearchResult
+
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: ["serper"])
+    monkeypatch.setattr(carbon_agent, "_call_provider", lambda name, query, language: [
+        SearchResult("BVRio", "https://bvrio.org", "Mercado", "Serper API", 0.95)
+    ])
+    response = client.post('/search/stream', json={
+        "query": "Qual o preço do carbono no stream?",
+        "trial_key": "CARBON-DEMO123456"
+    })
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    body = response.get_data(as_text=True)
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["meta", "provider", "summary", "quota", "done"]
+    assert '"source": "Serper API"' in body
+
+
+def test_search_stream_rejects_unknown_trial(client):
+    response = client.post('/search/stream', json={"query": "carbono", "trial_key": "CARBON-NOPE"})
+    assert response.status_code == 401
+    assert response.get_json()["success"] is False
+
+
+def test_search_batch_dedupes_and_charges_once(client, monkeypatch):
+    from app import carbon_agent, usage_accountant
+    from db import get_trial_by_key
+    from enhanced_bilingual_agent import SearchResult
+
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: ["serper"])
+    monkeypatch.setattr(carbon_agent, "_call_provider", lambda name, query, language: [
+        SearchResult("BVRio", "https://bvrio.org", query, "Serper API", 0.95)
+    ])
+    usage_accountant.flush()
+    before = get_trial_by_key("CARBON-DEMO123456")["queries_used"]
+    response = client.post('/search/batch', json={
+        "trial_key": "CARBON-DEMO123456",
+        "queries": ["Mercado de carbono em lote", "mercado de  CARBONO em lote", "Preço REDD+ em lote"]
+    })
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["queries_charged"] == 2
+    assert [item["query"] for item in body["results"]] == ["Mercado de carbono em lote", "Preço REDD+ em lote"]
+    assert all(item["status"] == "ok" for item in body["results"])
+    usage_accountant.flush()
+    assert get_trial_by_key("CARBON-DEMO123456")["queries_used"] == before + 2
+
+
+def test_searches_are_recorded_in_access_logs(client, monkeypatch):
+    import time
+    from app import access_log, carbon_agent
+    from db import get_connection
+    from enhanced_bilingual_agent import SearchResult
+
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: ["serper"])
+    monkeypatch.setattr(carbon_agent, "_call_provider", lambda name, query, language: [
+        SearchResult("BVRio", "https://bvrio.org", query, "Serper API", 0.95)
+    ])
+    response = client.post('/search', json={"query": "Registro de acesso ao carbono", "trial_key": "carbon-demo123456"},
+                           headers={"X-Forwarded-For": "203.0.113.7, 10.0.0.1"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["cache_status"] == "miss" and body["sources_count"] == 1 and "queries_remaining" in body
+
+    row = None
+    deadline = time.time() + 5
+    while row is None and time.time() < deadline:
+        access_log.drain()
+        row = get_connection().execute(
+            "SELECT trial_key, ip_address, latency_ms, sources, cache_hit FROM access_logs WHERE query = ?",
+            ("Registro de acesso ao carbono",)).fetchone()
+        time.sleep(0.05)
+    assert row is not None
+    assert row[0] == "CARBON-DEMO123456" and row[1] == "203.0.113.7"
+    assert row[2] >= 0 and row[3] == "Serper API" and row[4] == 0
+
+
+def test_offline_answer_from_local_index(client, monkeypatch):
+    from app import carbon_agent
+    from enhanced_bilingual_agent import LOCAL_INDEX_LABEL, SearchResult
+
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: ["serper"])
+    monkeypatch.setattr(carbon_agent, "_call_provider", lambda name, query, language: [
+        SearchResult("Reflorestamento no Cerrado", "https://cerrado.example", "Projetos ARR", "Serper API", 0.9)
+    ])
+    carbon_agent.comprehensive_search("reflorestamento cerrado projetos")
+    carbon_agent.result_index.flush()
+
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: [])  # every provider down
+    data = carbon_agent.comprehensive_search("projetos de reflorestamento")
+    assert data["offline"] is True
+    assert data["sources_used"] == [LOCAL_INDEX_LABEL]
+    assert data["results"][0].url == "https://cerrado.example"
+
+
+def test_trial_status_etag_and_304(client):
+    url = '/api/trial-status?trial_key=CARBON-DEMO123456'
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    second = client.get(url, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.get_data() == b""
+
+
+def test_large_responses_are_compressed(client):
+    import gzip
+
+    with client.session_transaction() as sess:
+        sess['logado'] = True
+    plain = client.get('/admin/diagnostics')
+    gzipped = client.get('/admin/diagnostics', headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in gzipped.headers["Vary"]
+    assert gzip.decompress(gzipped.get_data())[:20] == plain.get_data()[:20]
+
+    small = client.get('/health', headers={"Accept-Encoding": "gzip, br"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_static_assets_fingerprinted_and_pages_prerendered(client):
+    page = client.get('/trial')
+    assert page.status_code == 200
+    html = page.get_data(as_text=True)
+    assert '/static/style.css?v=' in html
+    assert client.get('/trial', headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+
+    asset_url = html.split('href="', 2)[1].split('"', 1)[0]
+    fresh = client.get(asset_url)
+    assert "immutable" in fresh.headers["Cache-Control"]
+    assert client.get('/static/style.css').headers["Cache-Control"] == "public, no-cache"
+
+
+def test_diagnostics_revalidates_with_304(client):
+    from app import access_log, usage_accountant
+
+    usage_accountant.flush()
+    access_log.drain()
+    with client.session_transaction() as sess:
+        sess['logado'] = True
+    first = client.get('/admin/diagnostics')
+    assert first.status_code == 200
+    second = client.get('/admin/diagnostics', headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
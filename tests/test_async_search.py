@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from async_search import AsyncSearchEngine
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path == "/slow":
+            time.sleep(2)
+        body = json.dumps({"items": [self.path]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeAgent:
+    def __init__(self, base_url, quorum_providers=0):
+        self.base_url = base_url
+        self.quorum_providers = quorum_providers
+        self.quorum_early_returns = 0
+
+    def _count_quorum(self, counter):
+        setattr(self, f"quorum_{counter}", getattr(self, f"quorum_{counter}") + 1)
+
+    def _quorum_met(self, results_map):
+        return self.quorum_providers > 0 and len(results_map) >= self.quorum_providers
+
+    def _provider_request(self, name, query, language):
+        return {"method": "POST", "url": f"{self.base_url}/{name}", "json": {"q": query}}
+
+    def _parse_provider(self, name, data):
+        return data["items"]
+
+    def _provider_timeout(self, name):
+        return 5.0
+
+    def _report_http_error(self, name, status):
+        pass
+
+    def _record_provider_outcome(self, name, ok, latency, status=None, error=None):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_async_engine_collects_results_and_cancels_stragglers(base_url):
+    engine = AsyncSearchEngine(FakeAgent(base_url))
+
+    started = time.monotonic()
+    results = engine.search(["fast", "slow"], "carbono", "pt-BR", budget=0.5)
+
+    assert results == {"fast": ["/fast"]}
+    assert time.monotonic() - started < 1.5
+    time.sleep(0.1)
+    assert engine.stats()["cancelled"] == 1
+
+
+def test_async_engine_quorum_returns_early_and_harvests(base_url):
+    agent = FakeAgent(base_url, quorum_providers=1)
+    engine = AsyncSearchEngine(agent)
+    harvested = threading.Event()
+    full = {}
+
+    def harvest(results_map):
+        full.update(results_map)
+        harvested.set()
+
+    started = time.monotonic()
+    results = engine.search(["fast", "slow"], "carbono", "pt-BR", budget=5, harvest=harvest)
+
+    assert results == {"fast": ["/fast"]}
+    assert time.monotonic() - started < 1.5
+    assert agent.quorum_early_returns == 1
+    assert harvested.wait(5)
+    assert full == {"fast": ["/fast"], "slow": ["/slow"]}
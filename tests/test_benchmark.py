@@ -0,0 +1,25 @@
+from benchmark import compare, measure, merge_baseline
+
+
+def test_compare_flags_only_slowdowns_above_threshold():
+    baseline = {"fast": {"median_us": 100.0}, "slow": {"median_us": 100.0}, "gone": {"median_us": 5.0}}
+    current = {"fast": {"median_us": 120.0}, "slow": {"median_us": 130.0}, "new": {"median_us": 1.0}}
+
+    assert compare(current, baseline, threshold=0.25) == [
+        {"case": "slow", "baseline_us": 100.0, "current_us": 130.0, "ratio": 1.3}
+    ]
+
+
+def test_measure_reports_per_call_stats():
+    stats = measure(lambda: sum(range(100)), min_time=0.01, repeats=3)
+    assert stats["rounds"] == 3
+    assert 0 < stats["min_us"] <= stats["median_us"] <= stats["max_us"]
+
+
+def test_merge_baseline_keeps_reference_timings():
+    baseline = {"results": {"db.lookup": {"median_us": 10.0}, "analyze_query": {"median_us": 80.0}}}
+    current = {"db.lookup": {"median_us": 14.0}, "analyze_query": {"median_us": 30.0}, "usage.charge": {"median_us": 5.0}}
+
+    assert merge_baseline(baseline, current, update=["analyze_query"]) == ["analyze_query", "usage.charge"]
+    assert {name: case["median_us"] for name, case in baseline["results"].items()} == {
+        "db.lookup": 10.0, "analyze_query": 30.0, "usage.charge": 5.0}
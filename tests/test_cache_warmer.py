@@ -0,0 +1,75 @@
+from cache_warmer import CacheWarmer
+
+
+class FakeExecutor:
+    saturated = False
+
+
+class FakeCache:
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.enabled = ttl_seconds > 0
+
+
+class FakeAgent:
+    def __init__(self, statuses, ttl_seconds=3600):
+        self.statuses = statuses
+        self.search_executor = FakeExecutor()
+        self.search_cache = FakeCache(ttl_seconds)
+        self.warmed = []
+
+    def _configured_providers(self):
+        return ["google", "serper"]
+
+    def warm_query(self, query, refresh_ahead):
+        self.warmed.append(query)
+        return self.statuses.get(query, "refreshed")
+
+
+def test_warmer_dedupes_and_respects_provider_budget():
+    agent = FakeAgent({"Preço do carbono": "fresh"})
+    warmer = CacheWarmer(
+        agent,
+        popular_queries=lambda limit: ["preço  do CARBONO", "REDD+", "Mercado B3", "COP30"],
+        seed_queries=["Preço do carbono"],
+        provider_budget=4,
+    )
+
+    outcome = warmer.run_once()
+
+    assert agent.warmed == ["Preço do carbono", "REDD+", "Mercado B3"]
+    assert outcome == {"fresh": 1, "loaded": 0, "refreshed": 2, "deferred": 1, "errors": 0, "provider_calls": 4}
+
+
+def test_warmer_does_nothing_when_the_cache_is_disabled():
+    agent = FakeAgent({}, ttl_seconds=0)
+    warmer = CacheWarmer(agent, popular_queries=lambda limit: ["REDD+"], seed_queries=["Mercado B3"])
+
+    warmer.start()
+    assert warmer.run_once()["provider_calls"] == 0
+    assert agent.warmed == [] and warmer.stats()["running"] is False
+
+
+def test_warmer_warns_when_ttl_is_shorter_than_its_cycle(capsys):
+    CacheWarmer(FakeAgent({}, ttl_seconds=120), popular_queries=lambda limit: [],
+                interval_seconds=300, margin_seconds=60)
+    assert "shorter than interval + margin" in capsys.readouterr().out
+    CacheWarmer(FakeAgent({}, ttl_seconds=3600), popular_queries=lambda limit: [],
+                interval_seconds=300, margin_seconds=60)
+    assert "shorter than" not in capsys.readouterr().out
+
+
+def test_agent_warm_query_skips_fresh_entries(monkeypatch):
+    from app import carbon_agent
+    from enhanced_bilingual_agent import SearchResult
+
+    calls = []
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: ["serper"])
+    monkeypatch.setattr(carbon_agent, "_call_provider", lambda name, query, language: calls.append(query) or [
+        SearchResult("BVRio", "https://bvrio.org", query, "Serper API", 0.95)
+    ])
+    query = "Aquecimento do cache de créditos"
+    assert carbon_agent.warm_query(query, refresh_ahead=60) == "refreshed"
+    assert carbon_agent.warm_query(query, refresh_ahead=60) == "fresh"
+    assert calls == [query]
+    assert carbon_agent.comprehensive_search(query)["cache_status"] == "hit"
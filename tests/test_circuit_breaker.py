@@ -0,0 +1,46 @@
+from circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_on_error_rate_and_recovers_via_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("google", min_calls=4, failure_rate=0.5, open_seconds=30, clock=clock)
+    for ok in (True, False, True, False):
+        breaker.record(ok, 0.2)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now = 31
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(True, 0.2)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_opens_on_slow_calls_and_trip():
+    breaker = CircuitBreaker("serper", min_calls=2, slow_call_seconds=1.0, slow_call_rate=1.0)
+    breaker.record(True, 1.5)
+    breaker.record(True, 2.0)
+    assert breaker.state == OPEN
+
+    other = CircuitBreaker("tavily")
+    other.trip("HTTP 429")
+    assert other.state == OPEN
+    assert other.snapshot()["last_error"] == "HTTP 429"
+
+
+def test_adaptive_timeout_follows_latency_percentile():
+    breaker = CircuitBreaker("serper", min_calls=5, min_timeout=0.5, max_timeout=5.0, timeout_factor=2.0)
+    assert breaker.timeout() == 5.0  # not enough samples yet
+    for latency in (0.3, 0.4, 0.4, 0.5, 0.6):
+        breaker.record(True, latency)
+    assert breaker.timeout() == 1.2
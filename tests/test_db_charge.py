@@ -0,0 +1,37 @@
+import threading
+
+import db
+
+
+def test_concurrent_charges_never_exceed_the_limit(new_trial):
+    key = new_trial(queries_limit=20)
+    outcomes = []
+
+    def worker():
+        for _ in range(10):
+            outcomes.append(db.charge_trial(key))
+        db.close_thread_connections()
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    charged = [trial for trial, _ in outcomes if trial]
+    assert sorted(trial["queries_used"] for trial in charged) == list(range(1, 21))
+    assert {reason for trial, reason in outcomes if not trial} == {"limit_reached"}
+    assert db.get_trial_by_key(key)["queries_used"] == 20
+
+
+def test_rejections_explain_why_and_charge_nothing(new_trial):
+    assert db.charge_trial("CARBON-NOPE") == (None, "not_found")
+
+    key = new_trial(queries_limit=3)
+    trial, reason = db.charge_trial(key.lower().replace("-", ""), count=2)  # fuzzy match
+    assert reason is None and trial["trial_key"] == key and trial["queries_used"] == 2
+    assert db.charge_trial(key, count=2) == (None, "limit_reached")
+
+    expired = new_trial(days=-1)
+    assert db.charge_trial(expired) == (None, "expired")
+    assert db.get_trial_by_key(expired)["queries_used"] == 0
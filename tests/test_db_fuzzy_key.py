@@ -0,0 +1,14 @@
+import db
+
+
+def test_fuzzy_lookup_uses_normalized_key_index():
+    db.seed_default_trial()
+    assert db.get_trial_by_key_fuzzy("carbon-demo-123456")["trial_key"] == "CARBON-DEMO123456"
+    assert db.get_trial_by_key_fuzzy("CARBONDEMO123457") is None
+
+    plan = db.get_connection().execute(
+        f"EXPLAIN QUERY PLAN SELECT trial_key FROM trials "
+        f"WHERE {db.NORMALIZED_KEY_SQL} = UPPER(REPLACE(?, '-', '')) LIMIT 1",
+        ("carbon-demo123456",),
+    ).fetchall()
+    assert "idx_trials_key_normalized" in plan[0][-1]
@@ -0,0 +1,30 @@
+import threading
+
+import db
+
+
+def test_connections_are_per_thread_and_reused():
+    first = db.get_connection()
+    first.close()  # returns it to the pool, still usable
+    assert db.get_connection() is first
+    assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+
+def test_open_transactions_are_rolled_back_on_release():
+    db.seed_default_trial()
+    before = db.count_trials()
+    conn = db.get_connection()
+    conn.execute("UPDATE trials SET queries_used = queries_used + 1000")
+    conn.close()
+    assert not conn.in_transaction
+    assert db.count_trials() == before
+    stats = db.pool_stats()
+    assert stats["rollbacks"] >= 1
+    assert stats["journal_mode"] == "wal"
@@ -0,0 +1,19 @@
+from loadtest import Recorder, percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_recorder_summary_counts_errors_by_status():
+    recorder = Recorder()
+    recorder.add("/search", 0.1, True, 200)
+    recorder.add("/search", 0.3, False, 401)
+    summary = recorder.summary(elapsed=2.0)["/search"]
+    assert summary["requests"] == 2
+    assert summary["throughput_rps"] == 1.0
+    assert summary["error_rate"] == 0.5
+    assert summary["statuses"] == {"200": 1, "401": 1}
@@ -0,0 +1,33 @@
+from markdown_render import _TOKENS, _replace, render_markdown
+from responses import render_agent_answer
+
+
+def test_bold_pairs_breaks_and_escaping():
+    text = "**1. Preço <b>**\n🔗 https://x.org/?a=1&b=2\n\n**Fim** e ** solto"
+    assert render_markdown(text) == (
+        "<strong>1. Preço &lt;b&gt;</strong><br>🔗 https://x.org/?a=1&amp;b=2<br><br>"
+        "<strong>Fim</strong> e ** solto"
+    )
+
+
+def test_block_memo_matches_single_pass():
+    text = "A\n\n\n**B**\n\nC & D\n"
+    assert render_markdown(text) == _TOKENS.sub(_replace, text)
+
+
+def test_render_cache_skips_formatting_for_repeat_payloads():
+    from enhanced_bilingual_agent import SearchResult
+
+    calls = []
+    payload = {"language": "en", "query": "q", "total_found": 1,
+               "results": [SearchResult("T", "https://t", "s", "Serper API", 0.9)]}
+
+    def fmt(data):
+        calls.append(data)
+        return "**Search Results - q**"
+
+    first = render_agent_answer("render cache q", payload, "English (US)", False, fmt)
+    second = render_agent_answer("render cache q", dict(payload, timestamp="later"), "English (US)", False, fmt)
+    assert first == second
+    assert "<strong>Search Results - q</strong>" in first
+    assert len(calls) == 1
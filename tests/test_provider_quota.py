@@ -0,0 +1,37 @@
+from provider_quota import ProviderQuota
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_is_shared_between_workers(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "quota.db")
+    worker_a = ProviderQuota(path, {"serper": (2.0, 0)}, clock=clock)
+    worker_b = ProviderQuota(path, {"serper": (2.0, 0)}, clock=clock)
+
+    assert worker_a.try_acquire("serper")
+    assert worker_b.try_acquire("serper")
+    assert not worker_a.try_acquire("serper")
+
+    clock.now += 0.5  # refills one token at 2/s
+    assert worker_b.try_acquire("serper")
+    assert worker_a.snapshot()["providers"]["serper"]["denied"] == 1
+
+
+def test_daily_limit_resets_next_day(tmp_path):
+    clock = FakeClock()
+    quota = ProviderQuota(str(tmp_path / "quota.db"), {"google": (0, 2), "tavily": (0, 0)}, clock=clock)
+
+    assert quota.try_acquire("google")
+    assert quota.try_acquire("google")
+    assert not quota.try_acquire("google")
+    assert quota.try_acquire("tavily")  # unlimited
+
+    clock.now += 86400
+    assert quota.try_acquire("google")
@@ -0,0 +1,35 @@
+import requests
+
+from provider_standin import FaultProfile, Recordings, StandInServer, parse_errors, parse_latency
+
+
+def test_replays_recordings_and_synthesizes_unknown_queries(tmp_path):
+    recordings = Recordings(str(tmp_path / "rec.json"))
+    recordings.put("serper", "Preço do carbono", 200, {"organic": [{"title": "B3", "link": "https://b3.com.br"}]})
+
+    with StandInServer(recordings=Recordings(recordings.path)) as server:
+        recorded = requests.post(f"{server.base_url}/serper/search", json={"q": "preço  do CARBONO"}, timeout=5)
+        synthetic = requests.get(f"{server.base_url}/google/customsearch/v1", params={"q": "REDD+"}, timeout=5)
+
+    assert recorded.json()["organic"][0]["link"] == "https://b3.com.br"
+    assert len(synthetic.json()["items"]) == 5
+    assert server.counters["serper"]["replayed"] == 1
+
+
+def test_fault_injection_drives_agent_breaker(monkeypatch):
+    from app import carbon_agent
+    from circuit_breaker import OPEN, CircuitBreaker
+
+    faults = FaultProfile(latency={"*": parse_latency("fixed:0.01")}, errors={"tavily": parse_errors("429:1.0")})
+    with StandInServer(faults=faults) as server:
+        monkeypatch.setattr(carbon_agent, "endpoints", {
+            "serper": f"{server.base_url}/serper/search",
+            "tavily": f"{server.base_url}/tavily/search",
+        })
+        monkeypatch.setattr(carbon_agent, "breakers", {name: CircuitBreaker(name) for name in carbon_agent.breakers})
+        monkeypatch.setattr(carbon_agent, "serper_api_key", "test")
+        monkeypatch.setattr(carbon_agent, "tavily_api_key", "test")
+
+        assert len(carbon_agent._search_serper("mercado de carbono")) == 5
+        assert carbon_agent._search_tavily("mercado de carbono", "pt-BR") == []
+        assert carbon_agent.breakers["tavily"].state == OPEN
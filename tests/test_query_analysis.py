@@ -0,0 +1,41 @@
+from query_analysis import (
+    BRAZILIAN_ENTITIES, LOCATION_INDICATORS, PORTUGUESE_KEYWORDS, analyze_query
+)
+
+QUERIES = [
+    "Onde posso comprar créditos de carbono no Brasil?",
+    "Qual é o preço atual dos créditos de carbono?",
+    "Where can I buy carbon credits in Brazil?",
+    "What are the current carbon credit prices?",
+    "REDD+ projects in the Amazon",
+    "Projetos em São Paulo",
+    "verified offsets for aviation",
+    "carbono brasil",  # 'no brasil' only as a substring spanning two words
+    "Preço € da tonelada na AMAZÔNIA",
+    "verified offsets for aviation in the aviation market " * 8,
+]
+
+
+def legacy_language(query):
+    query_lower = query.lower()
+    hit = any(k in query_lower for k in PORTUGUESE_KEYWORDS) or any(e in query_lower for e in BRAZILIAN_ENTITIES)
+    return 'pt-BR' if hit else 'en'
+
+
+def legacy_location(query):
+    return any(indicator in query.lower() for indicator in LOCATION_INDICATORS)
+
+
+def test_analysis_matches_legacy_substring_checks():
+    for query in QUERIES:
+        analysis = analyze_query(query)
+        assert analysis.language == legacy_language(query), query
+        assert analysis.location_specific == legacy_location(query), query
+
+
+def test_accent_folding_and_fallback_intent():
+    assert analyze_query("preco do carbono").fallback_intent == "price"
+    assert analyze_query("Quando começa a COP 30 em Belem?").fallback_intent == "cop30"
+    assert analyze_query("amazonia").location_specific
+    assert analyze_query("net zero").fallback_intent == "default"
+    assert analyze_query("Onde comprar?") is analyze_query("Onde comprar?")
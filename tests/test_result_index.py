@@ -0,0 +1,41 @@
+from result_index import ResultIndex, match_expression
+
+
+def test_match_expression_folds_and_drops_short_tokens():
+    assert match_expression("Preço do carbono no Brasil?") == '"preco" OR "carbono" OR "brasil"'
+    assert match_expression("de no") == ""
+
+
+def test_index_ranks_with_bm25_and_upserts_by_url(tmp_path):
+    index = ResultIndex(str(tmp_path / "index.db"))
+    index.add([
+        {"title": "Mercado de carbono no Brasil", "url": "https://a", "snippet": "Créditos REDD+", "source": "Serper API"},
+        {"title": "Energia solar", "url": "https://b", "snippet": "Painéis e carbono", "source": "Google"},
+    ] + [
+        {"title": f"Notícia {i}", "url": f"https://n{i}", "snippet": "Clima e florestas", "source": "Google"}
+        for i in range(6)
+    ], "pt-BR")
+    index.add([{"title": "Mercado de carbono brasileiro", "url": "https://a", "snippet": "B3", "source": "Tavily"}], "pt-BR")
+    index.flush()
+
+    hits = index.search("mercado carbono", limit=5)
+    assert [hit["url"] for hit in hits] == ["https://a", "https://b"]
+    assert hits[0]["title"] == "Mercado de carbono brasileiro"
+    assert 0 < hits[1]["score"] < hits[0]["score"] <= 1
+    assert index.stats()["rows"] == 8
+    # The replaced row left the FTS index too
+    assert index.search("creditos redd") == []
+    index._connect().execute("INSERT INTO results_fts (results_fts) VALUES ('integrity-check')")
+
+
+def test_language_preference_and_indexed_upsert(tmp_path):
+    index = ResultIndex(str(tmp_path / "index.db"))
+    index.write([
+        ([{"title": "Carbon market carbon credits", "url": "https://en", "snippet": "carbon"}], "en", 1.0),
+        ([{"title": "Mercado de carbono", "url": "https://pt", "snippet": "créditos"}], "pt-BR", 1.0),
+    ] + [([{"title": f"Notícia {i}", "url": f"https://n{i}", "snippet": "clima"}], "pt-BR", 1.0) for i in range(6)])
+    assert [hit["url"] for hit in index.search("carbon carbono", limit=2)][0] == "https://en"
+    assert [hit["url"] for hit in index.search("carbon carbono", limit=2, language="pt-BR")][0] == "https://pt"
+
+    plan = index._connect().execute("EXPLAIN QUERY PLAN SELECT id FROM results WHERE url = ?", ("https://en",))
+    assert "USING COVERING INDEX sqlite_autoindex_results_1" in plan.fetchone()[-1]
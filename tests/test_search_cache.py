@@ -0,0 +1,130 @@
+import threading
+import time
+
+from search_cache import SearchCache, PersistentSearchCache, SingleFlight, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_normalizes_query():
+    assert make_cache_key("  Preço   do Carbono ", "pt-BR") == make_cache_key("preço do carbono", "pt-BR")
+    assert make_cache_key("carbon", "en") != make_cache_key("carbon", "pt-BR")
+
+
+def test_fresh_stale_and_expired_entries():
+    clock = FakeClock()
+    cache = SearchCache(max_entries=4, ttl_seconds=10, stale_seconds=5, clock=clock)
+    cache.set("k", {"results": [1]})
+
+    assert cache.get("k") == ({"results": [1]}, False)
+    clock.now = 12
+    assert cache.get("k") == ({"results": [1]}, True)
+    clock.now = 16
+    assert cache.get("k") == (None, False)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_lru_eviction():
+    cache = SearchCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {})
+    cache.set("b", {})
+    cache.get("a")
+    cache.set("c", {})
+
+    assert cache.get("b") == (None, False)
+    assert cache.get("a")[0] is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_persistent_cache_round_trip_and_purge(tmp_path):
+    clock = FakeClock()
+    cache = PersistentSearchCache(str(tmp_path / "cache.db"), ttl_seconds=10, stale_seconds=5, clock=clock)
+    cache.set("k", {"query": "preço", "results": [{"title": "t"}]})
+
+    # A second instance simulates another gunicorn worker on the same file
+    other = PersistentSearchCache(str(tmp_path / "cache.db"), ttl_seconds=10, stale_seconds=5, clock=clock)
+    clock.now = 3
+    assert other.get("k") == ({"query": "preço", "results": [{"title": "t"}]}, 3)
+
+    clock.now = 20
+    assert other.get("k") is None
+    assert other.purge() == 1
+
+
+def test_persistent_cache_size_cap(tmp_path):
+    clock = FakeClock()
+    cache = PersistentSearchCache(str(tmp_path / "cache.db"), ttl_seconds=60, max_bytes=1, clock=clock)
+    cache.set("old", {"v": 1})
+    clock.now = 1
+    cache.set("new", {"v": 2})
+    cache.max_bytes = cache.stats()["size_bytes"] - 1
+
+    assert cache.purge() == 1
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+
+
+def test_single_flight_coalesces_concurrent_callers():
+    flight = SingleFlight()
+    gate = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        gate.wait(2)
+        return {"total_found": 3}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("en|carbon", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == {"total_found": 3} for result, _ in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cached_and_coalesced_payloads_report_the_callers_query(monkeypatch):
+    from app import carbon_agent
+    from enhanced_bilingual_agent import SearchResult
+
+    release = threading.Event()
+
+    def slow_provider(name, query, language):
+        release.wait(5)
+        return [SearchResult("BVRio", "https://bvrio.org", query, "Serper API", 0.95)]
+
+    monkeypatch.setattr(carbon_agent, "_planned_providers", lambda: ["serper"])
+    monkeypatch.setattr(carbon_agent, "_call_provider", slow_provider)
+    first, second = "Créditos de metano no Cerrado", "CRÉDITOS de metano no  cerrado"
+    outcomes = {}
+    leader = threading.Thread(target=lambda: outcomes.update(first=carbon_agent.comprehensive_search(first)))
+    leader.start()
+    time.sleep(0.1)
+    follower = threading.Thread(target=lambda: outcomes.update(second=carbon_agent.comprehensive_search(second)))
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert outcomes["first"]["query"] == first
+    assert (outcomes["second"]["query"], outcomes["second"]["cache_status"]) == (second, "coalesced")
+    third = "créditos de metano  no cerrado"
+    cached = carbon_agent.comprehensive_search(third)
+    assert (cached["query"], cached["cache_status"]) == (third, "hit")
+    assert f"Pesquisa - {third}**" in carbon_agent.format_response(cached)
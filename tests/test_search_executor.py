@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from search_executor import BoundedSearchExecutor, ProviderSaturated, SearchSaturated
+
+
+def test_executor_rejects_when_saturated_and_recovers():
+    executor = BoundedSearchExecutor(max_workers=1, max_queue=1, per_provider=5)
+    gate = threading.Event()
+    running = [executor.submit("serper", gate.wait), executor.submit("google", gate.wait)]
+
+    assert executor.saturated
+    with pytest.raises(SearchSaturated):
+        executor.submit("tavily", gate.wait)
+
+    gate.set()
+    for future in running:
+        future.result(timeout=2)
+    assert not executor.saturated
+    assert executor.stats()["rejected"] == 1
+
+
+def test_executor_caps_each_provider():
+    executor = BoundedSearchExecutor(max_workers=4, max_queue=4, per_provider=1)
+    gate = threading.Event()
+    executor.submit("google", gate.wait)
+
+    with pytest.raises(ProviderSaturated):
+        executor.submit("google", gate.wait)
+    executor.submit("serper", gate.wait)
+    gate.set()
+
+    assert executor.stats()["provider_rejected"] == {"google": 1}
+
+
+def test_batch_lane_leaves_provider_slots_for_interactive_calls():
+    executor = BoundedSearchExecutor(max_workers=4, max_queue=4, per_provider=4, batch_share=0.5)
+    gate = threading.Event()
+    executor.submit("google", gate.wait, batch=True)
+    executor.submit("google", gate.wait, batch=True)
+
+    with pytest.raises(ProviderSaturated):
+        executor.submit("google", gate.wait, batch=True)
+    interactive = [executor.submit("google", gate.wait), executor.submit("google", gate.wait)]
+    gate.set()
+    for future in interactive:
+        future.result(timeout=2)
+
+    stats = executor.stats()
+    assert (stats["batch_per_provider"], stats["batch_rejected"]) == (2, 1)
+    assert stats["provider_rejected"] == {}
@@ -0,0 +1,52 @@
+import threading
+
+import db
+from usage_accounting import UsageAccountant
+
+
+def _accountant(**kw):
+    return UsageAccountant(lambda key: db.get_trial_by_key(key) or db.get_trial_by_key_fuzzy(key),
+                           db.apply_usage, **kw)
+
+
+def test_charges_are_buffered_and_coalesced_into_one_write(new_trial):
+    key = new_trial()
+    writes = []
+    usage = UsageAccountant(db.get_trial_by_key, lambda batch: (writes.append(batch), db.apply_usage(batch)),
+                            flush_interval_ms=0, flush_max_events=1000)
+    for expected in range(1, 31):
+        trial, reason = usage.charge(key)
+        assert reason is None and trial["queries_used"] == expected
+    assert db.get_trial_by_key(key)["queries_used"] == 0
+    assert usage.read(lambda: db.get_trial_by_key(key))["queries_used"] == 30
+
+    assert usage.flush() == 1
+    assert [batch[key][0] for batch in writes] == [30]
+    assert db.get_trial_by_key(key)["queries_used"] == 30
+    assert usage.charge(key)[0]["queries_used"] == 31  # cached row advanced with the flush
+    assert usage.stats()["loads"] == 1
+
+
+def test_quota_is_exact_under_concurrency_with_background_flushes(new_trial):
+    key = new_trial(queries_limit=25)
+    usage = _accountant(flush_interval_ms=5, flush_max_events=7, cache_ttl_seconds=0.01)
+    usage.start()
+    outcomes = []
+
+    def worker():
+        for _ in range(10):
+            outcomes.append(usage.charge(key.lower()))
+        db.close_thread_connections()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    usage.stop()
+
+    charged = [trial for trial, _ in outcomes if trial]
+    assert sorted(trial["queries_used"] for trial in charged) == list(range(1, 26))
+    assert {reason for trial, reason in outcomes if not trial} == {"limit_reached"}
+    assert db.get_trial_by_key(key)["queries_used"] == 25
+    assert usage.stats()["pending_events"] == 0
@@ -0,0 +1,213 @@
+"""
+🧮 Write-Behind Usage Accounting
+================================
+Keeps recently used trials in memory and charges searches against them,
+buffering the ``queries_used`` / ``last_access`` updates instead of writing
+SQLite on every request. Buffered increments are coalesced per trial and
+written in one transaction every ``flush_interval_ms`` or after
+``flush_max_events`` charges, and once more when the worker shuts down.
+
+Within a worker, quota checks are exact: a trial's usage is the value loaded
+from the DB plus everything charged since (pending or being written). Cached
+trials are reloaded after ``cache_ttl_seconds``, which bounds how stale the
+view of other workers' usage (and admin edits) can get.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+
+class UsageAccountant:
+    """In-memory trial cache plus a write-behind buffer for usage counters.
+
+    ``load_trial(key)`` returns the trial dict (exact key first, then fuzzy) or
+    None; ``apply_usage({trial_key: (count, last_access)})`` writes a batch in
+    one transaction.
+    """
+
+    def __init__(self, load_trial: Callable[[str], Optional[Dict]],
+                 apply_usage: Callable[[Dict[str, Tuple[int, str]]], None],
+                 flush_interval_ms: float = 250.0, flush_max_events: int = 100,
+                 cache_ttl_seconds: float = 5.0, max_entries: int = 10000):
+        self.load_trial = load_trial
+        self.apply_usage = apply_usage
+        self.flush_interval_ms = float(flush_interval_ms)
+        self.flush_max_events = max(1, int(flush_max_events))
+        self.cache_ttl_seconds = float(cache_ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        # Held while a batch is written and while a trial is (re)loaded, so a
+        # load never sees a half-applied flush
+        self._flush_lock = threading.Lock()
+        self._aliases: "OrderedDict[str, str]" = OrderedDict()  # requested key -> canonical key
+        self._trials: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()  # canonical -> (DB row, loaded_at)
+        self._pending: Dict[str, list] = {}  # canonical -> [count, last_access]
+        self._inflight: Dict[str, int] = {}
+        self._pending_events = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.loads = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.events_written = 0
+        self.flush_errors = 0
+        self.last_flush_ms = None
+
+    # -- cache ---------------------------------------------------------------
+
+    def _cached(self, trial_key: str) -> Optional[Dict]:
+        with self._lock:
+            canonical = self._aliases.get(trial_key)
+            entry = self._trials.get(canonical) if canonical else None
+            if entry and time.monotonic() - entry[1] < self.cache_ttl_seconds:
+                self._trials.move_to_end(canonical)
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def _load(self, trial_key: str) -> Optional[Dict]:
+        with self._flush_lock:
+            trial = self.load_trial(trial_key)
+            if not trial:
+                return None
+            canonical = trial["trial_key"]
+            with self._lock:
+                self.loads += 1
+                self._aliases[trial_key] = canonical
+                self._aliases.move_to_end(trial_key)
+                self._trials[canonical] = (dict(trial), time.monotonic())
+                self._trials.move_to_end(canonical)
+                while len(self._trials) > self.max_entries:
+                    self._trials.popitem(last=False)
+                while len(self._aliases) > self.max_entries:
+                    self._aliases.popitem(last=False)
+            return trial
+
+    def _unflushed(self, canonical: str) -> int:
+        pending = self._pending.get(canonical)
+        return (pending[0] if pending else 0) + self._inflight.get(canonical, 0)
+
+    def read(self, load: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """The row returned by ``load()`` with this worker's not-yet-written usage added."""
+        with self._flush_lock:
+            trial = load()
+            if not trial:
+                return None
+            with self._lock:
+                extra = self._unflushed(trial["trial_key"])
+        return dict(trial, queries_used=trial["queries_used"] + extra) if extra else trial
+
+    # -- charging ------------------------------------------------------------
+
+    def charge(self, trial_key: str, count: int = 1) -> Tuple[Optional[Dict], Optional[str]]:
+        """Same contract as ``db.charge_trial``: (trial, None) or (None, reason)."""
+        trial = self._cached(trial_key) or self._load(trial_key)
+        if not trial:
+            return None, "not_found"
+        canonical = trial["trial_key"]
+        with self._lock:
+            # Re-read under the lock: a flush may have advanced the cached row
+            trial = self._trials.get(canonical, (trial,))[0]
+            used = trial["queries_used"] + self._unflushed(canonical)
+            if datetime.fromisoformat(trial["end_date"]) < datetime.now():
+                return None, "expired"
+            if used + count > trial["queries_limit"]:
+                return None, "limit_reached"
+            pending = self._pending.setdefault(canonical, [0, None])
+            pending[0] += count
+            pending[1] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            self._pending_events += count
+            full = self._pending_events >= self.flush_max_events
+            charged = dict(trial, queries_used=used + count)
+        if full:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+        return charged, None
+
+    # -- write-behind ----------------------------------------------------------
+
+    def flush(self) -> int:
+        """Write all buffered usage in one transaction; returns the trials updated."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = {key: (count, last_access) for key, (count, last_access) in self._pending.items()}
+                self._inflight = {key: count for key, (count, _) in batch.items()}
+                self._pending = {}
+                events, self._pending_events = self._pending_events, 0
+            started = time.perf_counter()
+            try:
+                self.apply_usage(batch)
+            except Exception as e:
+                print(f"[USAGE] Flush of {len(batch)} trial(s) failed, keeping them buffered: {e}")
+                with self._lock:
+                    for key, (count, last_access) in batch.items():
+                        pending = self._pending.setdefault(key, [0, last_access])
+                        pending[0] += count
+                    self._pending_events += events
+                    self._inflight = {}
+                    self.flush_errors += 1
+                return 0
+            with self._lock:
+                # The DB now holds these increments: fold them into the cached rows
+                for key, (count, _) in batch.items():
+                    entry = self._trials.get(key)
+                    if entry:
+                        entry[0]["queries_used"] += count
+                self._inflight = {}
+                self.flushes += 1
+                self.rows_written += len(batch)
+                self.events_written += events
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            return len(batch)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_ms / 1000.0)
+            self._wake.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is None and self.flush_interval_ms > 0:
+            self._thread = threading.Thread(target=self._loop, name='usage-write-behind', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write whatever is still buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        written = self.flush()
+        if written:
+            print(f"[USAGE] Final flush wrote usage for {written} trial(s)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending_trials, pending_events = len(self._pending), self._pending_events
+            cached = len(self._trials)
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'flush_interval_ms': self.flush_interval_ms,
+            'flush_max_events': self.flush_max_events,
+            'cache_ttl_seconds': self.cache_ttl_seconds,
+            'cached_trials': cached,
+            'pending_trials': pending_trials,
+            'pending_events': pending_events,
+            'hits': self.hits,
+            'loads': self.loads,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'events_written': self.events_written,
+            'flush_errors': self.flush_errors,
+            'last_flush_ms': self.last_flush_ms,
+        }